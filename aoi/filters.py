@@ -1,6 +1,65 @@
+import math
+
 import django_filters
+from django import forms
+from django.contrib.gis.geos import Polygon
+
+from asset_watch.geojson import with_geojson
 from .models import Aoi, EncroachmentDetection
 
+# Highest web map zoom level a client can ask geometries to be simplified for
+MAX_ZOOM = 22
+
+
+class BBoxField(forms.CharField):
+    """A minx,miny,maxx,maxy bounding box in EPSG:4326, as a Polygon"""
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if not value:
+            return None
+
+        try:
+            minx, miny, maxx, maxy = (float(part) for part in value.split(","))
+        except ValueError:
+            raise forms.ValidationError("Enter a bounding box as minx,miny,maxx,maxy.")
+        if not all(map(math.isfinite, (minx, miny, maxx, maxy))):
+            raise forms.ValidationError("Bounding box coordinates must be finite.")
+        if minx > maxx or miny > maxy:
+            raise forms.ValidationError(
+                "Bounding box minimums must not exceed its maximums."
+            )
+
+        bbox = Polygon.from_bbox((minx, miny, maxx, maxy))
+        bbox.srid = 4326
+        return bbox
+
+
+class BBoxFilter(django_filters.Filter):
+    """Features whose bounding box overlaps the given one, with the && operator"""
+
+    field_class = BBoxField
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("lookup_expr", "bboverlaps")
+        super().__init__(*args, **kwargs)
+
+
+class ZoomFilter(django_filters.Filter):
+    """Simplify the GeoJSON of field_name for display at a map zoom level"""
+
+    field_class = forms.IntegerField
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("min_value", 0)
+        kwargs.setdefault("max_value", MAX_ZOOM)
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value is None:
+            return qs
+        return with_geojson(qs, self.field_name, zoom=value)
+
 
 class AoiFilter(django_filters.FilterSet):
     status = django_filters.ChoiceFilter(choices=Aoi.STATUS_CHOICES)
@@ -12,6 +71,8 @@ class AoiFilter(django_filters.FilterSet):
     created_before = django_filters.DateTimeFilter(
         field_name="created_at", lookup_expr="lte"
     )
+    bbox = BBoxFilter(field_name="geometry")
+    zoom = ZoomFilter(field_name="geometry")
 
     class Meta:
         model = Aoi
@@ -30,6 +91,8 @@ class EncroachmentDetectionFilter(django_filters.FilterSet):
         field_name="detected_at", lookup_expr="lte"
     )
     aoi = django_filters.UUIDFilter()
+    bbox = BBoxFilter(field_name="affected_area")
+    zoom = ZoomFilter(field_name="affected_area")
 
     class Meta:
         model = EncroachmentDetection
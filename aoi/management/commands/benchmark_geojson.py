@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_gis.serializers import GeoFeatureModelSerializer
+
+from aoi.models import Aoi
+from aoi.serializers import AoiSerializer
+from asset_watch.geojson import GeoJSONRenderer, with_geojson
+
+User = get_user_model()
+
+# Synthetic AOIs are scattered around this point (lon, lat)
+ORIGIN = (3.4, 6.5)
+
+
+class Rollback(Exception):
+    pass
+
+
+class GeometryAoiSerializer(GeoFeatureModelSerializer):
+    """AoiSerializer's output, built from GEOS geometries in Python"""
+
+    class Meta(AoiSerializer.Meta):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare AOI GeoJSON output built in Python with output built by "
+        "ST_AsGeoJSON. Data is created in a transaction that is rolled back "
+        "afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--payloads",
+            type=int,
+            nargs="+",
+            default=[1_000, 10_000, 100_000],
+            help="Total vertices per response",
+        )
+        parser.add_argument(
+            "--vertices-per-aoi", type=int, default=100, help="Vertices per AOI"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Runs per case; the median is kept"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            help="JSON results file (default benchmarks/geojson-<time>.json)",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.results = {
+            "benchmark": "geojson",
+            "started_at": timezone.now().isoformat(),
+            "parameters": {
+                key: options[key]
+                for key in ["payloads", "vertices_per_aoi", "repeat", "seed"]
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "geojson_precision": settings.GEOJSON_PRECISION,
+            },
+            "cases": [],
+        }
+
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.write_results(options["output"])
+
+    def run(self, options):
+        user = User.objects.create(email="benchmark-geojson@example.com", password="!")
+        vertices = max(options["vertices_per_aoi"], 4)
+
+        for payload in options["payloads"]:
+            count = max(payload // vertices, 1)
+            self.stdout.write(f"{count} AOIs of {vertices} vertices...")
+            Aoi.objects.filter(user=user).delete()
+            Aoi.objects.bulk_create(
+                [
+                    Aoi(user=user, name=f"AOI {i}", geometry=self.polygon(vertices))
+                    for i in range(count)
+                ],
+                batch_size=1000,
+            )
+            queryset = Aoi.objects.filter(user=user).order_by("id")
+
+            python = self.measure(
+                lambda: JSONRenderer().render(
+                    GeometryAoiSerializer(queryset.all(), many=True).data
+                ),
+                options["repeat"],
+            )
+            database = self.measure(
+                lambda: GeoJSONRenderer().render(
+                    AoiSerializer(
+                        with_geojson(queryset.all(), "geometry"), many=True
+                    ).data
+                ),
+                options["repeat"],
+            )
+
+            case = {
+                "aois": count,
+                "vertices": count * vertices,
+                "python": python,
+                "database": database,
+                "speedup": (
+                    round(python["seconds"] / database["seconds"], 2)
+                    if database["seconds"]
+                    else None
+                ),
+            }
+            self.results["cases"].append(case)
+            self.stdout.write(
+                f"{case['vertices']:>9} vertices: python {python['seconds']:.3f}s "
+                f"{python['bytes']} bytes, database {database['seconds']:.3f}s "
+                f"{database['bytes']} bytes ({case['speedup']}x)"
+            )
+
+    def polygon(self, vertices: int) -> Polygon:
+        """Irregular polygon of about 1 km with the given number of vertices"""
+        lon = ORIGIN[0] + self.rng.uniform(-0.5, 0.5)
+        lat = ORIGIN[1] + self.rng.uniform(-0.5, 0.5)
+        ring = []
+        for i in range(vertices - 1):
+            angle = 2 * math.pi * i / (vertices - 1)
+            radius = 0.005 * self.rng.uniform(0.8, 1.2)
+            ring.append(
+                (lon + radius * math.cos(angle), lat + radius * math.sin(angle))
+            )
+        ring.append(ring[0])
+        return Polygon(ring, srid=4326)
+
+    def measure(self, render, repeat: int) -> dict:
+        """Median time to query, serialize and render, with size and queries"""
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                output = render()
+                timings.append(time.perf_counter() - started)
+
+        return {
+            "seconds": round(statistics.median(timings), 4),
+            "bytes": len(output),
+            "queries": len(queries),
+        }
+
+    def write_results(self, output):
+        if not output:
+            os.makedirs("benchmarks", exist_ok=True)
+            output = os.path.join(
+                "benchmarks", f"geojson-{timezone.now():%Y%m%dT%H%M%S}.json"
+            )
+
+        with open(output, "w") as f:
+            json.dump(self.results, f, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aoi",
+            name="next_run_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="aoi",
+            index=models.Index(
+                condition=models.Q(("is_paid", True), ("status", "active")),
+                fields=["next_run_at"],
+                name="aoi_next_run_at_idx",
+            ),
+        ),
+        # Spread the first scheduled run of existing active AOIs over an hour
+        migrations.RunSQL(
+            "UPDATE aoi SET next_run_at = now() + random() * interval '1 hour' "
+            "WHERE status = 'active'",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:44
+
+from django.db import migrations
+
+from asset_watch.partitioning_v1 import convert_to_partitioned
+
+
+def partition_encroachment_detection(apps, schema_editor):
+    convert_to_partitioned(
+        "encroachment_detection", "detected_at", schema_editor.connection
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0002_aoi_next_run_at"),
+        # Drops the foreign key from notification, which cannot reference a
+        # partitioned table
+        ("notifications", "0002_partition_notification"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_encroachment_detection),
+    ]
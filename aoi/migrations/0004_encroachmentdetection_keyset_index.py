@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0003_partition_encroachment_detection"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="encroachmentdetection",
+            index=models.Index(
+                fields=["detected_at", "id"], name="encroachment_detected_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:01
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0004_encroachmentdetection_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aoi",
+            index=django.contrib.postgres.indexes.GistIndex(
+                django.db.models.functions.comparison.Cast(
+                    "geometry",
+                    django.contrib.gis.db.models.fields.GeometryField(
+                        geography=True, srid=4326
+                    ),
+                ),
+                name="aoi_geography_idx",
+            ),
+        ),
+    ]
@@ -1,8 +1,11 @@
 from django.contrib.gis.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GistIndex
 from django.utils import timezone
 import uuid
 
+from .search import aoi_geography
+
 User = get_user_model()
 
 
@@ -33,6 +36,8 @@ class Aoi(models.Model):
     start_date = models.DateTimeField(null=True, blank=True)
     end_date = models.DateTimeField(null=True, blank=True)
     is_paid = models.BooleanField(default=False)
+    # When the scheduler should next run monitoring for this AOI
+    next_run_at = models.DateTimeField(null=True, blank=True)
 
     # Cart-specific fields
     added_to_cart_at = models.DateTimeField(auto_now_add=True)
@@ -40,6 +45,15 @@ class Aoi(models.Model):
     class Meta:
         db_table = "aoi"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["next_run_at"],
+                name="aoi_next_run_at_idx",
+                condition=models.Q(status="active", is_paid=True),
+            ),
+            # Nearby search in metres; see aoi.search
+            GistIndex(aoi_geography(), name="aoi_geography_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.user.email}"
@@ -48,6 +62,7 @@ class Aoi(models.Model):
         """Activate monitoring and set dates based on monitoring type"""
         self.status = "active"
         self.start_date = timezone.now()
+        self.next_run_at = self.start_date
 
         if self.monitoring_type == "daily":
             self.end_date = self.start_date + timezone.timedelta(days=1)
@@ -79,8 +94,16 @@ class EncroachmentDetection(models.Model):
     confirmed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
+        # Range-partitioned by month on detected_at, with a primary key of
+        # (id, detected_at) in the database; see asset_watch.partitioning
         db_table = "encroachment_detection"
         ordering = ["-detected_at"]
+        indexes = [
+            # Keyset pagination
+            models.Index(
+                fields=["detected_at", "id"], name="encroachment_detected_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"Encroachment in {self.aoi.name} - {self.severity}"
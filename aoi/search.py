@@ -0,0 +1,49 @@
+"""
+Nearby AOI search on geography.
+
+AOI geometries are stored in EPSG:4326, where distances are in degrees.
+Searches cast them to geography to work in metres, and the aoi_geography_idx
+GiST index is built on that same cast so ST_DWithin and the <-> KNN operator
+can both be answered from it.
+"""
+
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db.models import FloatField, Func, Value
+from django.db.models.functions import Cast
+
+# Default and largest number of AOIs a nearby search returns
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def aoi_geography():
+    """AOI geometry as geography; must match the aoi_geography_idx index"""
+    return Cast("geometry", GeometryField(srid=4326, geography=True))
+
+
+class KNNDistance(Func):
+    """Distance with the <-> operator, in metres on geography.
+
+    Ordering by it lets PostGIS walk a GiST index nearest first instead of
+    computing and sorting every distance.
+    """
+
+    arg_joiner = " <-> "
+    template = "%(expressions)s"
+    output_field = FloatField()
+
+
+def find_nearby(queryset, point: Point, radius: float, limit: int = DEFAULT_LIMIT):
+    """AOIs of queryset within radius metres of point, nearest first.
+
+    Each AOI is annotated with its distance in metres.
+    """
+    origin = Value(point, output_field=GeometryField(srid=4326, geography=True))
+    return (
+        queryset.alias(geography=aoi_geography())
+        .filter(geography__dwithin=(origin, D(m=radius)))
+        .annotate(distance=KNNDistance("geography", origin))
+        .order_by("distance")[:limit]
+    )
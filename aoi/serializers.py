@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
+from asset_watch.geojson import DatabaseGeoJSONMixin
 from .models import Aoi, EncroachmentDetection
 
 
-class AoiSerializer(GeoFeatureModelSerializer):
+class AoiSerializer(DatabaseGeoJSONMixin, GeoFeatureModelSerializer):
     class Meta:
         model = Aoi
         geo_field = "geometry"
@@ -33,7 +34,15 @@ class AoiSerializer(GeoFeatureModelSerializer):
         return super().create(validated_data)
 
 
-class EncroachmentDetectionSerializer(GeoFeatureModelSerializer):
+class NearbyAoiSerializer(AoiSerializer):
+    # Metres from the search point, annotated by aoi.search.find_nearby
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta(AoiSerializer.Meta):
+        fields = AoiSerializer.Meta.fields + ["distance"]
+
+
+class EncroachmentDetectionSerializer(DatabaseGeoJSONMixin, GeoFeatureModelSerializer):
     aoi_name = serializers.CharField(source="aoi.name", read_only=True)
 
     class Meta:
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Aoi, EncroachmentDetection
+from .tiles import invalidate_tiles
+
+
+@receiver([post_save, post_delete], sender=Aoi)
+def invalidate_aoi_tiles(sender, instance, **kwargs):
+    # Deleting an AOI also deletes its detections
+    invalidate_tiles([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=EncroachmentDetection)
+def invalidate_encroachment_tiles(sender, instance, **kwargs):
+    # bulk_create sends no signals, so callers that bulk create detections
+    # invalidate tiles themselves
+    try:
+        user_id = instance.aoi.user_id
+    except Aoi.DoesNotExist:
+        return
+    invalidate_tiles([user_id], ["encroachments"])
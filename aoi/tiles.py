@@ -0,0 +1,155 @@
+"""
+Mapbox Vector Tiles of a user's AOIs and encroachments.
+
+Tiles are built in PostGIS with ST_AsMVT and cached per user. Each user and
+layer has a version number that is part of every tile's cache key; bumping
+it when the user's AOIs or detections change invalidates all their cached
+tiles at once, and the old entries expire on their own.
+"""
+
+import logging
+import time
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Tile extent in tile coordinates, and the buffer kept around it so
+# features crossing tile edges render without seams
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Layer name -> query selecting the layer's features for a user. Each query
+# returns a "geom" column in tile coordinates and the feature properties;
+# %(z)s, %(x)s, %(y)s and %(user_id)s are bound when a tile is built.
+TILE_LAYERS = {
+    "aois": """
+        SELECT ST_AsMVTGeom(
+                   ST_Transform(aoi.geometry, 3857), bounds.geom, %(extent)s,
+                   %(buffer)s, true
+               ) AS geom,
+               aoi.id::text AS id,
+               aoi.name,
+               aoi.status,
+               aoi.monitoring_type,
+               aoi.is_paid
+        FROM aoi, bounds
+        WHERE aoi.user_id = %(user_id)s
+          AND aoi.geometry && ST_Transform(bounds.geom, 4326)
+    """,
+    "encroachments": """
+        SELECT ST_AsMVTGeom(
+                   ST_Transform(encroachment.affected_area, 3857), bounds.geom,
+                   %(extent)s, %(buffer)s, true
+               ) AS geom,
+               encroachment.id::text AS id,
+               encroachment.aoi_id::text AS aoi_id,
+               encroachment.severity,
+               encroachment.confidence_score,
+               encroachment.is_confirmed,
+               to_char(
+                   encroachment.detected_at AT TIME ZONE 'UTC',
+                   'YYYY-MM-DD"T"HH24:MI:SS"Z"'
+               ) AS detected_at
+        FROM encroachment_detection encroachment
+        JOIN aoi ON aoi.id = encroachment.aoi_id, bounds
+        WHERE aoi.user_id = %(user_id)s
+          AND encroachment.affected_area && ST_Transform(bounds.geom, 4326)
+    """,
+}
+
+MAX_ZOOM = 22
+
+
+def get_tile_cache():
+    return caches[settings.TILE_CACHE_ALIAS]
+
+
+def _version_key(user_id, layer: str) -> str:
+    return f"tiles:version:{layer}:{user_id}"
+
+
+def get_tile_version(user_id, layer: str) -> int:
+    """Current version of a user's tiles for layer"""
+    cache = get_tile_cache()
+    key = _version_key(user_id, layer)
+    try:
+        version = cache.get(key)
+        if version is None:
+            # Start from the current time, so that if a version is evicted
+            # its replacement never matches tiles cached under the old one
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            version = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Tile cache unavailable: {e}")
+        return 0
+    return version or 0
+
+
+def invalidate_tiles(user_ids: Iterable, layers: Iterable[str] = None) -> None:
+    """Invalidate every cached tile of the given users' layers"""
+    cache = get_tile_cache()
+    for user_id in set(user_ids):
+        for layer in layers or TILE_LAYERS:
+            key = _version_key(user_id, layer)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # No version yet, so nothing of this layer is cached
+                pass
+            except Exception as e:
+                logger.warning(f"Could not invalidate {layer} tiles of {user_id}: {e}")
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def build_tile(user_id, layer: str, z: int, x: int, y: int) -> bytes:
+    """Build a tile of a user's layer in PostGIS"""
+    sql = f"""
+        WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom),
+        features AS ({TILE_LAYERS[layer]})
+        SELECT ST_AsMVT(features.*, %(layer)s, %(extent)s, 'geom')
+        FROM features
+        WHERE features.geom IS NOT NULL
+    """
+    params = {
+        "z": z,
+        "x": x,
+        "y": y,
+        "user_id": user_id,
+        "layer": layer,
+        "extent": TILE_EXTENT,
+        "buffer": TILE_BUFFER,
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tile = cursor.fetchone()[0]
+
+    return bytes(tile) if tile else b""
+
+
+def get_tile(user_id, layer: str, z: int, x: int, y: int, version: int) -> bytes:
+    """Tile of a user's layer at version, from the cache when possible"""
+    cache = get_tile_cache()
+    key = f"tiles:{layer}:{user_id}:{version}:{z}/{x}/{y}"
+
+    try:
+        tile = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Tile cache unavailable: {e}")
+        return build_tile(user_id, layer, z, x, y)
+
+    if tile is None:
+        tile = build_tile(user_id, layer, z, x, y)
+        try:
+            cache.set(key, tile, timeout=settings.TILE_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Could not cache tile {key}: {e}")
+
+    return tile
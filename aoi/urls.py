@@ -1,3 +1,4 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 from . import views
 
@@ -7,4 +8,10 @@ router.register(
     "encroachments", views.EncroachmentDetectionViewSet, basename="encroachment"
 )
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path(
+        "tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt",
+        views.VectorTileView.as_view(),
+        name="vector-tile",
+    ),
+]
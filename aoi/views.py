@@ -1,23 +1,34 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from django.contrib.gis.geos import Point
-from django.contrib.gis.measure import D
 from .models import Aoi, EncroachmentDetection
-from .serializers import AoiSerializer, EncroachmentDetectionSerializer
+from .serializers import (
+    AoiSerializer,
+    EncroachmentDetectionSerializer,
+    NearbyAoiSerializer,
+)
 from .filters import AoiFilter, EncroachmentDetectionFilter
+from .search import DEFAULT_LIMIT, MAX_LIMIT, find_nearby
+from .tiles import TILE_LAYERS, get_tile, get_tile_version, is_valid_tile
 from order.services import CartService
+from asset_watch.geojson import GeoJSONRenderer, StreamingGeoJSONMixin, with_geojson
+from asset_watch.pagination import KeysetPagination
 
 
-class AoiViewSet(viewsets.ModelViewSet):
+class AoiViewSet(StreamingGeoJSONMixin, viewsets.ModelViewSet):
     serializer_class = AoiSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = AoiFilter
+    renderer_classes = [GeoJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
-        return Aoi.objects.filter(user=self.request.user)
+        return with_geojson(Aoi.objects.filter(user=self.request.user), "geometry")
 
     def create(self, request):
         """Create AOI and add to cart"""
@@ -62,10 +73,11 @@ class AoiViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def nearby(self, request):
-        """Find AOIs near a given point"""
+        """Find AOIs near a given point, nearest first"""
         lat = request.query_params.get("lat")
         lon = request.query_params.get("lon")
         radius = request.query_params.get("radius", 1000)  # meters
+        limit = request.query_params.get("limit", DEFAULT_LIMIT)
 
         if not lat or not lon:
             return Response(
@@ -75,26 +87,42 @@ class AoiViewSet(viewsets.ModelViewSet):
 
         try:
             point = Point(float(lon), float(lat), srid=4326)
-            nearby_aois = self.get_queryset().filter(
-                geometry__distance_lte=(point, D(m=float(radius)))
-            )
-            serializer = self.get_serializer(nearby_aois, many=True)
-            return Response(serializer.data)
+            radius = float(radius)
+            limit = min(int(limit), MAX_LIMIT)
+            if radius <= 0 or limit <= 0:
+                raise ValueError
         except (ValueError, TypeError):
             return Response(
-                {"error": "Invalid coordinates or radius"},
+                {"error": "Invalid coordinates, radius or limit"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        nearby_aois = find_nearby(self.get_queryset(), point, radius, limit)
+        serializer = NearbyAoiSerializer(
+            nearby_aois, many=True, context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
 
-class EncroachmentDetectionViewSet(viewsets.ReadOnlyModelViewSet):
+class EncroachmentDetectionViewSet(
+    StreamingGeoJSONMixin, viewsets.ReadOnlyModelViewSet
+):
     serializer_class = EncroachmentDetectionSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = EncroachmentDetectionFilter
+    pagination_class = KeysetPagination
+    ordering = ["-detected_at", "-id"]
+    renderer_classes = [GeoJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
-        return EncroachmentDetection.objects.filter(aoi__user=self.request.user)
+        # The AOI is only needed for its name; skip loading its geometry
+        queryset = (
+            EncroachmentDetection.objects.filter(aoi__user=self.request.user)
+            .select_related("aoi")
+            .defer("aoi__geometry")
+        )
+        return with_geojson(queryset, "affected_area")
 
     @action(detail=True, methods=["post"])
     def confirm(self, request, pk=None):
@@ -108,3 +136,30 @@ class EncroachmentDetectionViewSet(viewsets.ReadOnlyModelViewSet):
 
         serializer = self.get_serializer(encroachment)
         return Response(serializer.data)
+
+
+class VectorTileView(APIView):
+    """Mapbox Vector Tile of the user's AOIs or encroachments.
+
+    Tiles are cached per user and revalidated by ETag, which changes
+    whenever the user's layer does.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, layer, z, x, y):
+        if layer not in TILE_LAYERS or not is_valid_tile(z, x, y):
+            raise Http404
+
+        version = get_tile_version(request.user.id, layer)
+        etag = f'"{layer}-{version}"' if version else None
+        if etag and etag in request.headers.get("If-None-Match", ""):
+            return HttpResponseNotModified(headers={"ETag": etag})
+
+        tile = get_tile(request.user.id, layer, z, x, y, version)
+
+        response = HttpResponse(tile, content_type="application/vnd.mapbox-vector-tile")
+        response["Cache-Control"] = "private, no-cache"
+        if etag:
+            response["ETag"] = etag
+        return response
@@ -2,10 +2,14 @@ import os
 from celery import Celery
 from django.conf import settings
 from celery.schedules import crontab
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "asset_watch.settings")
 
+# Connect the task and worker signal handlers that record metrics
+import asset_watch.metrics  # noqa: E402, F401
+
 app = Celery("asset_watch")
 
 # Using a string here means the worker doesn't have to serialize
@@ -15,16 +19,58 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Queues, consumed by separate workers so long-running ingestion or
+# maintenance never delays monitoring:
+# - interactive: user-triggered monitoring runs, on a worker that scheduled
+#   bulk runs never fill
+# - scheduling: the per-minute scheduler and the job reaper
+# - monitoring: scheduled AOI and scene monitoring
+# - ingestion: satellite catalog ingestion
+# - maintenance: cleanup and other housekeeping
+app.conf.task_queues = [
+    Queue("interactive"),
+    Queue("scheduling"),
+    Queue("monitoring"),
+    Queue("ingestion"),
+    Queue("maintenance"),
+]
+app.conf.task_default_queue = "monitoring"
+app.conf.task_routes = {
+    "monitoring.tasks.schedule_monitoring_jobs": {"queue": "scheduling"},
+    "monitoring.tasks.reap_stale_monitoring_jobs": {"queue": "scheduling"},
+    "monitoring.tasks.monitor_aoi_task": {"queue": "monitoring"},
+    "monitoring.tasks.monitor_scene_task": {"queue": "monitoring"},
+    "monitoring.tasks.fetch_satellite_images": {"queue": "ingestion"},
+    "monitoring.tasks.cleanup_old_data": {"queue": "maintenance"},
+    "monitoring.tasks.maintain_partitions": {"queue": "maintenance"},
+}
+
+# Priorities within a queue, 0 being the highest (Redis emulates them with
+# one list per priority step, and workers take from the highest first)
+app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+app.conf.task_default_priority = 5
+
 # Configure periodic tasks
 app.conf.beat_schedule = {
     "schedule-monitoring-jobs": {
         "task": "monitoring.tasks.schedule_monitoring_jobs",
-        "schedule": crontab(minute=0),  # Every hour
+        "schedule": crontab(),  # Every minute
+    },
+    "reap-stale-monitoring-jobs": {
+        "task": "monitoring.tasks.reap_stale_monitoring_jobs",
+        "schedule": crontab(minute="*/10"),  # Every 10 minutes
     },
     "fetch-satellite-images": {
         "task": "monitoring.tasks.fetch_satellite_images",
         "schedule": crontab(hour=0, minute=0),  # Daily at midnight
     },
+    "maintain-partitions": {
+        "task": "monitoring.tasks.maintain_partitions",
+        "schedule": crontab(hour=1, minute=0),  # Daily at 1 AM
+    },
     "cleanup-old-data": {
         "task": "monitoring.tasks.cleanup_old_data",
         "schedule": crontab(
@@ -0,0 +1,196 @@
+"""
+Fast GeoJSON output for large list endpoints.
+
+Geometries are selected as GeoJSON text with ST_AsGeoJSON instead of being
+loaded into GEOS objects and converted back in Python. The text is carried
+through serialization as RawJSON; the JSON encoder writes a placeholder for
+it, and the placeholders are replaced with the raw text in the output.
+Given a map zoom level, geometries are also simplified in the database to
+the detail visible at that zoom.
+
+List endpoints can also stream a whole FeatureCollection with ?stream=1:
+features are serialized one at a time from a queryset iterator and written
+out in chunks, so memory stays flat however many features are exported and
+the first bytes go out as soon as the first rows are fetched.
+"""
+
+import math
+import re
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import AsGeoJSON, GeomOutputGeoFunc
+from django.db.models import Value
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_gis.fields import GeometryField
+
+# Rows fetched per round trip from the server-side cursor
+ITERATOR_CHUNK_SIZE = 2000
+# Bytes buffered before a chunk is sent to the client
+STREAM_BUFFER_SIZE = 64 * 1024
+# Width in pixels of a web map tile, which sets the ground size of a pixel
+# at each zoom level
+TILE_PIXELS = 256
+
+# Placeholders are JSON strings wrapped in NUL characters, which serializer
+# CharFields reject, so they cannot collide with real values
+PLACEHOLDER = "\x00{}\x00"
+PLACEHOLDER_PATTERN = re.compile(rb'"\\u0000(\d+)\\u0000"')
+
+
+class RawJSON:
+    """Already encoded JSON to be written to the output as is"""
+
+    __slots__ = ["text"]
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def raw_json_encoder(base, raw: list):
+    """JSON encoder class writing placeholders for RawJSON, collected in raw"""
+
+    class RawJSONEncoder(base):
+        def default(self, obj):
+            if isinstance(obj, RawJSON):
+                raw.append(obj.text.encode())
+                return PLACEHOLDER.format(len(raw) - 1)
+            return super().default(obj)
+
+    return RawJSONEncoder
+
+
+def splice_raw_json(output: bytes, raw: list) -> bytes:
+    """Replace the placeholders in encoded output with their raw JSON"""
+    if not raw:
+        return output
+    return PLACEHOLDER_PATTERN.sub(lambda match: raw[int(match[1])], output)
+
+
+class GeoJSONRenderer(JSONRenderer):
+    """JSONRenderer that writes RawJSON values into the output unchanged"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        raw = []
+        self.encoder_class = raw_json_encoder(JSONEncoder, raw)
+        return splice_raw_json(
+            super().render(data, accepted_media_type, renderer_context), raw
+        )
+
+
+class SimplifyPreserveTopology(GeomOutputGeoFunc):
+    """ST_SimplifyPreserveTopology, which keeps simplified polygons valid"""
+
+    def __init__(self, expression, tolerance: float, **extra):
+        super().__init__(expression, Value(tolerance), **extra)
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """Size in degrees of a map pixel at zoom, at the equator"""
+    return 360 / (TILE_PIXELS * 2**zoom)
+
+
+def with_geojson(queryset, field: str, precision: int = None, zoom: int = None):
+    """Select field as GeoJSON text, as <field>_geojson, instead of as geometry.
+
+    With a zoom level, the geometry is simplified to about a pixel at that
+    zoom and coordinates are written with no more decimals than that needs.
+    """
+    if precision is None:
+        precision = settings.GEOJSON_PRECISION
+
+    geometry = field
+    if zoom is not None:
+        tolerance = zoom_tolerance(zoom)
+        geometry = SimplifyPreserveTopology(field, tolerance)
+        precision = min(precision, max(math.ceil(-math.log10(tolerance)), 0))
+
+    return queryset.annotate(
+        **{f"{field}_geojson": AsGeoJSON(geometry, precision=precision)}
+    ).defer(field)
+
+
+class DatabaseGeometryField(GeometryField):
+    """Geometry field that outputs the GeoJSON selected by with_geojson.
+
+    Falls back to converting the geometry in Python when the instance has
+    no GeoJSON, or its geometry has been loaded or set since.
+    """
+
+    def get_attribute(self, instance):
+        geojson = getattr(instance, f"{self.source}_geojson", None)
+        if geojson is not None and self.source in instance.get_deferred_fields():
+            return RawJSON(geojson)
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        if isinstance(value, RawJSON):
+            return value
+        return super().to_representation(value)
+
+
+class DatabaseGeoJSONMixin:
+    """Use DatabaseGeometryField for a GeoFeatureModelSerializer's geo_field"""
+
+    def build_field(self, field_name, info, model_class, nested_depth):
+        field_class, field_kwargs = super().build_field(
+            field_name, info, model_class, nested_depth
+        )
+        if field_name == self.Meta.geo_field:
+            field_class = DatabaseGeometryField
+        return field_class, field_kwargs
+
+
+def stream_feature_collection(queryset, serializer):
+    """Yield a GeoJSON FeatureCollection of queryset as byte chunks.
+
+    serializer is a GeoFeatureModelSerializer instance used to represent
+    each object as a feature.
+    """
+    raw = []
+    encoder = raw_json_encoder(JSONEncoder, raw)(
+        ensure_ascii=False, separators=(",", ":")
+    )
+    buffer = [b'{"type":"FeatureCollection","features":[']
+    size = 0
+    separator = b""
+
+    for instance in queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        feature = encoder.encode(serializer.to_representation(instance)).encode()
+        feature = splice_raw_json(feature, raw)
+        raw.clear()
+
+        buffer.append(separator + feature)
+        size += len(feature)
+        separator = b","
+
+        if size >= STREAM_BUFFER_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+
+    buffer.append(b"]}")
+    yield b"".join(buffer)
+
+
+class StreamingGeoJSONMixin:
+    """Let a GeoJSON list endpoint stream its results unpaginated with ?stream=1"""
+
+    stream_param = "stream"
+
+    def should_stream(self, request) -> bool:
+        value = request.query_params.get(self.stream_param, "")
+        return value.lower() in ("1", "true", "yes")
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_stream(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_feature_collection(queryset, self.get_serializer()),
+            content_type="application/geo+json",
+        )
+        response["Cache-Control"] = "no-store"
+        return response
@@ -0,0 +1,223 @@
+"""
+Prometheus metrics for the API, Celery tasks and websockets.
+
+Gunicorn and Celery run several processes per container, so when
+PROMETHEUS_MULTIPROC_DIR is set every process writes its samples to files in
+that directory and a scrape aggregates them. Gunicorn serves the aggregate
+at /metrics; each Celery worker serves its own on WORKER_METRICS_PORT.
+Queue depths are read from the broker at scrape time.
+
+Websocket connections are counted by the ASGI application, so they are only
+reported when asset_watch.asgi is served by a server (e.g. daphne) sharing
+gunicorn's PROMETHEUS_MULTIPROC_DIR; the WSGI app alone never opens one.
+"""
+
+import hmac
+import logging
+import os
+import shutil
+import time
+
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+    worker_ready,
+)
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Metric files are created as soon as a metric has a value, so the
+# directory has to exist before any metric below is defined
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by view and viewset action",
+    ["view", "action", "method", "status"],
+)
+
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds",
+    "Celery task run time by task and final state",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600, float("inf")),
+)
+
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_connections",
+    "Open notification websocket connections",
+    multiprocess_mode="livesum",
+)
+
+
+def clear_multiprocess_dir():
+    """Remove metric files left by a previous run of this container"""
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def mark_process_dead(pid):
+    """Drop a dead process's live gauges from the aggregate"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def get_registry() -> CollectorRegistry:
+    """Registry aggregating every process's metrics, or this process's"""
+    if not MULTIPROC_DIR:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+class CeleryQueueCollector:
+    """Collect the number of messages waiting in each Celery queue"""
+
+    def collect(self):
+        from asset_watch.celery import app
+
+        gauge = GaugeMetricFamily(
+            "celery_queue_length",
+            "Messages waiting in a Celery queue",
+            labels=["queue"],
+        )
+
+        try:
+            with app.connection_for_read() as connection:
+                # Fail the scrape's queue lengths fast if the broker is down
+                connection.ensure_connection(max_retries=1)
+                channel = connection.default_channel
+                for queue in app.conf.task_queues:
+                    declared = channel.queue_declare(queue=queue.name, passive=True)
+                    gauge.add_metric([queue.name], declared.message_count)
+        except Exception as e:
+            logger.warning(f"Could not read Celery queue lengths: {e}")
+            return
+
+        yield gauge
+
+
+def metrics_view(request):
+    """Serve all metrics in the Prometheus text format.
+
+    Requests must send METRICS_TOKEN as a bearer token; without a token
+    configured, metrics are not served at all.
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponseForbidden()
+
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+        return HttpResponseForbidden()
+
+    queues = CollectorRegistry()
+    queues.register(CeleryQueueCollector())
+
+    return HttpResponse(
+        generate_latest(get_registry()) + generate_latest(queues),
+        content_type=CONTENT_TYPE_LATEST,
+    )
+
+
+class MetricsMiddleware:
+    """Record the latency of each request, labelled by the view that served it.
+
+    DRF viewsets are labelled by viewset class and action (list, retrieve,
+    or the name of an extra action), other views by URL name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view, action = self.get_view_labels(request)
+        HTTP_REQUEST_DURATION.labels(
+            view=view,
+            action=action,
+            method=request.method,
+            status=response.status_code,
+        ).observe(duration)
+
+        return response
+
+    @staticmethod
+    def get_view_labels(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "<unmatched>", ""
+
+        view_class = getattr(match.func, "cls", None)
+        if view_class is None:
+            return match.view_name, ""
+
+        actions = getattr(match.func, "actions", None) or {}
+        return view_class.__name__, actions.get(request.method.lower(), "")
+
+
+# Celery task metrics. Start times are kept per process, which is where
+# task_prerun and task_postrun both fire.
+_task_started = {}
+
+
+@task_prerun.connect
+def task_started(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task=task.name, state=state or "").observe(
+            time.perf_counter() - started
+        )
+
+
+@worker_init.connect
+def worker_starting(**kwargs):
+    clear_multiprocess_dir()
+
+
+@worker_ready.connect
+def worker_started(**kwargs):
+    port = settings.WORKER_METRICS_PORT
+    if not port:
+        return
+
+    try:
+        start_http_server(port, registry=get_registry())
+    except OSError as e:
+        logger.warning(f"Could not serve worker metrics on port {port}: {e}")
+        return
+    logger.info(f"Serving worker metrics on port {port}")
+
+
+@worker_process_shutdown.connect
+def worker_process_stopped(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
@@ -0,0 +1,191 @@
+"""
+Keyset pagination for large, append-heavy tables.
+
+Pages are ordered by the view's ``ordering``, a timestamp followed by the
+primary key as a tie-breaker, and each page is selected with a WHERE clause
+on the last row of the page before it instead of an OFFSET. With a composite
+index on the ordering columns every page costs the same as the first one.
+The total count is only computed when a client asks for it with ?count=1.
+"""
+
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by the view's ordering, which must end with a unique field"""
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if self.wants_count(request):
+            self.count = queryset.count()
+
+        cursor = self.decode_cursor(request)
+        self.reverse = cursor is not None and cursor["reverse"]
+        ordering = self.reversed(self.ordering) if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(ordering, cursor["values"], queryset))
+
+        # One row more than a page tells whether there is a page after it
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        # A previous cursor is only handed out from a page with rows after
+        # it, so going backwards there is always a next page; going forwards
+        # there is a previous page whenever the page was reached by cursor
+        if self.reverse:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_values = self.previous_values = None
+        if results and has_next:
+            self.next_values = self.values_of(results[-1])
+        if results and has_previous:
+            self.previous_values = self.values_of(results[0])
+
+        return results
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_link()
+        response["previous"] = self.get_previous_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_ordering(self, view) -> tuple:
+        ordering = getattr(view, "ordering", None)
+        assert (
+            ordering
+        ), f"{view.__class__.__name__} must set ordering to use KeysetPagination"
+        return tuple(ordering)
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def wants_count(self, request) -> bool:
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() in ("1", "true", "yes")
+
+    @staticmethod
+    def reversed(ordering) -> tuple:
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+        )
+
+    def after(self, ordering, values, queryset) -> Q:
+        """Condition selecting the rows after values in ordering.
+
+        The first field is also bounded on its own so the database can start
+        its index scan at the cursor.
+        """
+        names = [field.lstrip("-") for field in ordering]
+        try:
+            values = [
+                queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        conditions = Q()
+        equal = Q()
+        for field, name, value in zip(ordering, names, values):
+            lookup = "lt" if field.startswith("-") else "gt"
+            conditions |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        bound = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{names[0]}__{bound}": values[0]}) & conditions
+
+    def values_of(self, instance) -> list:
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            values.append(
+                value.isoformat() if hasattr(value, "isoformat") else str(value)
+            )
+        return values
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = cursor["v"], bool(cursor.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            not isinstance(values, list)
+            or len(values) != len(self.ordering)
+            or not all(isinstance(value, str) for value in values)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {"values": values, "reverse": reverse}
+
+    def encode_cursor(self, values, reverse: bool) -> str:
+        cursor = {"v": values}
+        if reverse:
+            cursor["r"] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,223 @@
+"""
+Monthly range partitioning of append-heavy tables.
+
+Partitions are named <table>_pYYYYMM and cover one calendar month (UTC) of
+the partition column. Each table also has a <table>_default partition that
+catches rows outside the created months, so inserts never fail if partition
+maintenance falls behind; those rows are moved into their month's partition
+when it is created.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, Tuple
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db import transaction
+
+from aoi.tiles import invalidate_tiles
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> partition column
+PARTITIONED_TABLES = {
+    "encroachment_detection": "detected_at",
+    "notification": "created_at",
+}
+
+# Partitioned table -> (table, column) pairs referencing its ids without a
+# database foreign key; referencing rows are deleted with a dropped partition
+PARTITION_REFERENCES = {
+    "encroachment_detection": [("notification", "encroachment_id")],
+}
+
+# Partitioned table -> (tile layer, query of the users owning a partition's
+# rows); those users' tiles of the layer are invalidated when it is dropped
+PARTITION_TILE_LAYERS = {
+    "encroachment_detection": (
+        "encroachments",
+        "SELECT DISTINCT aoi.user_id FROM aoi "
+        "WHERE aoi.id IN (SELECT aoi_id FROM {partition})",
+    ),
+}
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of value's month, in UTC"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def create_partition(table: str, month: datetime, connection=None) -> bool:
+    """Create the partition of table for month, returning False if it exists.
+
+    Rows of the month that landed in the default partition are moved into
+    the new partition, as Postgres refuses to create a partition for values
+    the default partition holds.
+    """
+    connection = connection or default_connection
+    name = partition_name(table, month)
+    default_name = f"{table}_default"
+    quote = connection.ops.quote_name
+    column = quote(PARTITIONED_TABLES[table])
+    bounds = [month, add_months(month, 1)]
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0]:
+            return False
+
+        moved = 0
+        cursor.execute("SELECT to_regclass(%s)", [default_name])
+        if cursor.fetchone()[0]:
+            # Block inserts into the default partition while rows move out
+            cursor.execute(f"LOCK TABLE {quote(default_name)} IN EXCLUSIVE MODE")
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {quote(default_name)} "
+                f"WHERE {column} >= %s AND {column} < %s)",
+                bounds,
+            )
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    f"CREATE TABLE {quote(name)} (LIKE {quote(table)} "
+                    f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                )
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {quote(default_name)} "
+                    f"WHERE {column} >= %s AND {column} < %s RETURNING *) "
+                    f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                    bounds,
+                )
+                moved = cursor.rowcount
+                cursor.execute(
+                    f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    bounds,
+                )
+
+        if not moved:
+            cursor.execute(
+                f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+
+    if moved:
+        logger.info(
+            f"Created partition {name}, moving {moved} rows from {default_name}"
+        )
+    else:
+        logger.info(f"Created partition {name}")
+    return True
+
+
+def ensure_partitions(months_ahead: int = 3, now=None, connection=None) -> List[str]:
+    """Create partitions from the current month to months_ahead months on"""
+    now = now or datetime.now(dt_timezone.utc)
+    created = []
+
+    for table in PARTITIONED_TABLES:
+        for offset in range(months_ahead + 1):
+            month = add_months(month_start(now), offset)
+            if create_partition(table, month, connection):
+                created.append(partition_name(table, month))
+
+    return created
+
+
+def list_partitions(table: str, connection=None) -> List[Tuple[str, datetime]]:
+    """Monthly partitions of table as (name, month), oldest first"""
+    connection = connection or default_connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+    partitions = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            month = datetime(
+                int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc
+            )
+            partitions.append((name, month))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def drop_partitions_before(table: str, cutoff: datetime, connection=None) -> List[str]:
+    """Drop partitions of table whose whole month is before cutoff.
+
+    Rows in the month containing cutoff are kept until that month has fully
+    expired, so retention is enforced with month granularity. Rows that
+    reference the dropped rows (see PARTITION_REFERENCES) are deleted first,
+    and cached tiles showing them (see PARTITION_TILE_LAYERS) invalidated.
+    """
+    connection = connection or default_connection
+    quote = connection.ops.quote_name
+    dropped = []
+
+    for name, month in list_partitions(table, connection):
+        if add_months(month, 1) > cutoff:
+            break
+
+        layer, users_sql = PARTITION_TILE_LAYERS.get(table, (None, None))
+        user_ids = []
+
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if layer:
+                cursor.execute(users_sql.format(partition=quote(name)))
+                user_ids = [row[0] for row in cursor.fetchall()]
+            for other_table, other_column in PARTITION_REFERENCES.get(table, []):
+                cursor.execute(
+                    f"DELETE FROM {quote(other_table)} WHERE {quote(other_column)} "
+                    f"IN (SELECT id FROM {quote(name)})"
+                )
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+            cursor.execute(f"DROP TABLE {quote(name)}")
+
+        if user_ids:
+            invalidate_tiles(user_ids, [layer])
+        logger.info(f"Dropped partition {name}")
+        dropped.append(name)
+
+    return dropped
+
+
+def drop_expired_partitions(now=None, connection=None) -> List[str]:
+    """Drop partitions past NOTIFICATION_RETENTION_DAYS and, if set,
+    ENCROACHMENT_RETENTION_DAYS"""
+    now = now or datetime.now(dt_timezone.utc)
+    dropped = drop_partitions_before(
+        "notification",
+        now - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS),
+        connection,
+    )
+    if settings.ENCROACHMENT_RETENTION_DAYS:
+        dropped += drop_partitions_before(
+            "encroachment_detection",
+            now - timedelta(days=settings.ENCROACHMENT_RETENTION_DAYS),
+            connection,
+        )
+    return dropped
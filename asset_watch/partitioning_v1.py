@@ -0,0 +1,95 @@
+"""
+Frozen partitioning DDL used by migrations.
+
+Migrations that converted tables to monthly range partitioning call into
+this module, so what they do is fixed once they are written. Do not edit
+it: later changes to partition maintenance belong in
+asset_watch.partitioning, and a migration needing different DDL should get
+a new versioned module.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def convert_to_partitioned(table: str, column: str, connection, months_ahead: int = 3):
+    """Rebuild an existing table as a monthly range-partitioned table.
+
+    Columns and defaults are copied, the primary key becomes (id, column) as
+    partitioned tables require, and the table's other indexes and foreign
+    keys are recreated on the new parent. A <table>_default partition is
+    created, plus <table>_pYYYYMM partitions for every month with existing
+    rows and the next months_ahead months. Foreign keys that reference the
+    table must be dropped beforehand.
+    """
+    quote = connection.ops.quote_name
+    old_table = f"{table}_unpartitioned"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE tablename = %s AND indexname NOT IN (
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = %s::regclass AND contype IN ('p', 'u')
+            )
+            """,
+            [table, table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min({quote(column)}) FROM {quote(table)}")
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} "
+            f"(LIKE {quote(old_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({quote(column)})"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(f'{table}_default')} "
+            f"PARTITION OF {quote(table)} DEFAULT"
+        )
+
+        now = datetime.now(dt_timezone.utc)
+        month = _month_start(oldest or now)
+        while month <= _add_months(_month_start(now), months_ahead):
+            cursor.execute(
+                f"CREATE TABLE {quote(f'{table}_p{month:%Y%m}')} "
+                f"PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                [month, _add_months(month, 1)],
+            )
+            month = _add_months(month, 1)
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}")
+        cursor.execute(f"DROP TABLE {quote(old_table)}")
+
+        # Index and constraint names are free again once the old table is gone
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(f'{table}_pkey')} "
+            f"PRIMARY KEY (id, {quote(column)})"
+        )
+        for name, definition in indexes:
+            cursor.execute(definition)
+
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
@@ -1,6 +1,8 @@
 from pathlib import Path
 from datetime import timedelta
+import json
 import os
+import tempfile
 import dj_database_url
 from logging.handlers import RotatingFileHandler
 
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
     "django.contrib.gis",
     # Third party apps
     "rest_framework",
+    "rest_framework_gis",
     "rest_framework_simplejwt",
     "corsheaders",
     "djoser",
@@ -60,6 +63,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "asset_watch.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -239,6 +243,124 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 
 
+# Monitoring settings
+MONITORING_DISPATCH_CHUNK_SIZE = int(
+    os.environ.get("MONITORING_DISPATCH_CHUNK_SIZE", "500")
+)
+
+# Scene runs retry AOIs they could not analyse this many times, waiting
+# MONITORING_SCENE_RETRY_DELAY seconds and doubling it on each attempt
+MONITORING_SCENE_RETRIES = int(os.environ.get("MONITORING_SCENE_RETRIES", "3"))
+MONITORING_SCENE_RETRY_DELAY = int(
+    os.environ.get("MONITORING_SCENE_RETRY_DELAY", "600")
+)
+
+# Scheduling: fraction of an AOI's monitoring interval its next run is
+# randomly shifted by, and the most AOIs claimed per scheduler run
+MONITORING_SCHEDULE_JITTER = float(os.environ.get("MONITORING_SCHEDULE_JITTER", "0.05"))
+MONITORING_SCHEDULE_MAX_PER_RUN = int(
+    os.environ.get("MONITORING_SCHEDULE_MAX_PER_RUN", "5000")
+)
+
+# Rows deleted per statement by retention cleanup
+RETENTION_DELETE_BATCH_SIZE = int(os.environ.get("RETENTION_DELETE_BATCH_SIZE", "5000"))
+
+# Monthly partitions of notification and encroachment_detection: months
+# created ahead, and how long rows are kept (whole months are dropped once
+# past retention; ENCROACHMENT_RETENTION_DAYS=0 keeps detections forever)
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", "3"))
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "30"))
+ENCROACHMENT_RETENTION_DAYS = int(os.environ.get("ENCROACHMENT_RETENTION_DAYS", "0"))
+
+# Open jobs older than these are marked failed so their AOI can run again.
+# A pending job's task may still be waiting in a backed-up queue and is
+# skipped once its job is failed, so the pending timeout must stay well
+# above the worst queue latency (and below the shortest monitoring interval)
+MONITORING_JOB_PENDING_TIMEOUT = timedelta(
+    minutes=int(os.environ.get("MONITORING_JOB_PENDING_TIMEOUT_MINUTES", "720"))
+)
+MONITORING_JOB_RUNNING_TIMEOUT = timedelta(
+    minutes=int(os.environ.get("MONITORING_JOB_RUNNING_TIMEOUT_MINUTES", "360"))
+)
+
+# Change detection: spectral index ("ndvi", "ndbi" or "combined"), the index
+# difference a pixel must exceed, and the smallest region reported
+MONITORING_CHANGE_INDEX = os.environ.get("MONITORING_CHANGE_INDEX", "ndvi")
+MONITORING_CHANGE_THRESHOLD = float(
+    os.environ.get("MONITORING_CHANGE_THRESHOLD", "0.2")
+)
+MONITORING_MIN_CHANGE_PIXELS = int(os.environ.get("MONITORING_MIN_CHANGE_PIXELS", "9"))
+
+# Pixel budget for a batch of AOIs analysed together from one scene read
+MONITORING_BATCH_MAX_PIXELS = int(
+    os.environ.get("MONITORING_BATCH_MAX_PIXELS", str(4096 * 4096))
+)
+
+# Processes per worker used to run change detection for a monitoring run
+# (0 runs detection inline in the task)
+MONITORING_DETECTION_POOL_SIZE = int(
+    os.environ.get("MONITORING_DETECTION_POOL_SIZE", str(os.cpu_count() or 1))
+)
+
+# Raster access: block size of windowed reads and the on-disk block cache
+# shared by workers on a host (set RASTER_CACHE_MAX_BYTES=0 to disable)
+RASTER_BLOCK_SIZE = int(os.environ.get("RASTER_BLOCK_SIZE", "512"))
+RASTER_CACHE_DIR = os.environ.get(
+    "RASTER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "asset_watch_tiles")
+)
+RASTER_CACHE_MAX_BYTES = int(
+    os.environ.get("RASTER_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024))
+)
+
+# Memory per worker thread for cached AOI geometries and rasterized AOI masks
+AOI_GEOMETRY_CACHE_MAX_BYTES = int(
+    os.environ.get("AOI_GEOMETRY_CACHE_MAX_BYTES", str(128 * 1024 * 1024))
+)
+
+# Default scene catalog: a STAC API URL, or a local STAC item collection file
+SATELLITE_CATALOG_URL = os.environ.get(
+    "SATELLITE_CATALOG_URL",
+    os.path.join(BASE_DIR, "monitoring", "sample_data", "stac_catalog.json"),
+)
+SATELLITE_CATALOG_COLLECTIONS = [
+    collection
+    for collection in os.environ.get(
+        "SATELLITE_CATALOG_COLLECTIONS", "sentinel-2-l2a"
+    ).split(",")
+    if collection
+]
+SATELLITE_CATALOG_PAGE_SIZE = int(os.environ.get("SATELLITE_CATALOG_PAGE_SIZE", "100"))
+# Asset holding the multi-band GeoTIFF that change detection reads
+SATELLITE_CATALOG_IMAGE_ASSET = os.environ.get("SATELLITE_CATALOG_IMAGE_ASSET", "image")
+
+# Scene providers searched concurrently, as JSON mapping a provider name to
+# its "url" and "collections", and optionally its "concurrency" (searches in
+# flight), request "timeout" in seconds and "retries" with backoff
+SATELLITE_PROVIDERS = json.loads(os.environ.get("SATELLITE_PROVIDERS", "null")) or {
+    "sentinel-2": {
+        "url": SATELLITE_CATALOG_URL,
+        "collections": SATELLITE_CATALOG_COLLECTIONS,
+    },
+}
+
+
+# Caches. Vector tiles are shared by every web worker through Redis
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "tiles": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("REDIS_URL", "redis://localhost:6379"),
+    },
+}
+TILE_CACHE_ALIAS = os.environ.get("TILE_CACHE_ALIAS", "tiles")
+TILE_CACHE_TIMEOUT = int(os.environ.get("TILE_CACHE_TIMEOUT", str(24 * 60 * 60)))
+
+# Decimal places of coordinates in GeoJSON generated by the database
+# (7 is about 1 cm in EPSG:4326)
+GEOJSON_PRECISION = int(os.environ.get("GEOJSON_PRECISION", "7"))
+
 # Channels (WebSocket) settings
 CHANNEL_LAYERS = {
     "default": {
@@ -264,6 +386,14 @@ TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.environ.get("TWILIO_PHONE_NUMBER")
 
 
+# Prometheus metrics. Set PROMETHEUS_MULTIPROC_DIR in the environment to
+# aggregate metrics across gunicorn and Celery worker processes. /metrics
+# requires METRICS_TOKEN as a bearer token and is disabled while it is unset;
+# Celery workers serve their metrics on WORKER_METRICS_PORT (0 disables).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", "9808"))
+
+
 # Security settings for production
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
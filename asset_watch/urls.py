@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from asset_watch.metrics import metrics_view
+
 
 admin.site.site_header = "Asset Watch Admin"
 admin.site.site_title = "Asset Watch Admin Portal"
@@ -28,6 +30,7 @@ admin.site.index_title = "Welcome to the Asset Watch Admin Portal"
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path("api/auth/", include("djoser.urls")),
     path("api/auth/", include("djoser.urls.jwt")),
     path("api/", include("aoi.urls")),
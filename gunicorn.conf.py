@@ -1,5 +1,7 @@
 import multiprocessing
 
+from asset_watch.metrics import clear_multiprocess_dir, mark_process_dead
+
 # Server socket
 bind = "0.0.0.0:8000"
 backlog = 2048
@@ -32,3 +34,13 @@ pidfile = "/tmp/gunicorn.pid"
 limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
+
+
+# Metrics: start each run with an empty multiprocess metrics directory and
+# drop a worker's live gauges when it exits (see asset_watch.metrics)
+def on_starting(server):
+    clear_multiprocess_dir()
+
+
+def child_exit(server, worker):
+    mark_process_dead(worker.pid)
@@ -1,6 +1,13 @@
+from datetime import timedelta
+
 from django.contrib import admin
 from django.contrib.gis.admin import GISModelAdmin
-from .models import MonitoringJob, SatelliteImage
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .models import CatalogCursor, MonitoringJob, ProcessedScene, SatelliteImage
+from .services import JobMetricsService
 
 
 @admin.register(MonitoringJob)
@@ -16,7 +23,43 @@ class MonitoringJobAdmin(GISModelAdmin):
     ]
     list_filter = ["status", "started_at"]
     search_fields = ["aoi__name", "aoi__user__email"]
-    readonly_fields = ["id", "started_at", "completed_at", "celery_task_id"]
+    readonly_fields = [
+        "id",
+        "started_at",
+        "completed_at",
+        "celery_task_id",
+        "stage_metrics",
+    ]
+    change_list_template = "admin/monitoring/monitoringjob/change_list.html"
+
+    def get_urls(self):
+        return [
+            path(
+                "stage-metrics/",
+                self.admin_site.admin_view(self.stage_metrics_view),
+                name="monitoring_monitoringjob_stage_metrics",
+            ),
+        ] + super().get_urls()
+
+    def stage_metrics_view(self, request):
+        """p50/p95 of stage metrics over jobs completed in the last ?days="""
+        try:
+            days = max(int(request.GET.get("days", 7)), 1)
+        except ValueError:
+            days = 7
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Monitoring job stage metrics",
+            "opts": self.model._meta,
+            "days": days,
+            "metrics": JobMetricsService.get_stage_percentiles(
+                timezone.now() - timedelta(days=days)
+            ),
+        }
+        return TemplateResponse(
+            request, "admin/monitoring/monitoringjob/stage_metrics.html", context
+        )
 
 
 @admin.register(SatelliteImage)
@@ -24,3 +67,17 @@ class SatelliteImageAdmin(GISModelAdmin):
     list_display = ["scene_id", "satellite", "acquisition_date", "cloud_coverage"]
     list_filter = ["satellite", "acquisition_date"]
     search_fields = ["scene_id"]
+
+
+@admin.register(ProcessedScene)
+class ProcessedSceneAdmin(admin.ModelAdmin):
+    list_display = ["aoi", "satellite_image", "processed_at"]
+    list_filter = ["processed_at"]
+    search_fields = ["aoi__name", "satellite_image__scene_id"]
+    readonly_fields = ["id", "processed_at"]
+
+
+@admin.register(CatalogCursor)
+class CatalogCursorAdmin(admin.ModelAdmin):
+    list_display = ["catalog", "last_acquired_at", "updated_at"]
+    readonly_fields = ["id", "updated_at"]
@@ -0,0 +1,287 @@
+"""
+Satellite scene catalogs.
+
+Catalogs page asynchronously through STAC items acquired at or after a given
+time, oldest first. Each page carries the request needed to fetch the page
+after it, so ingestion can stop between pages and resume later.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from datetime import datetime
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+import aiohttp
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry, Polygon
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CatalogError(Exception):
+    pass
+
+
+class CatalogPage(NamedTuple):
+    items: List[dict]
+    next_page: Optional[dict]
+
+
+class StacCatalog:
+    """Async client for a STAC API search endpoint, following "next" links.
+
+    A URL ending in .json is read as a static item collection instead, so a
+    chain of item collection files served over HTTP can stand in for an API.
+    Requests that time out, fail to connect or get a 429/5xx response are
+    retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        url,
+        collections=None,
+        page_size=100,
+        name=None,
+        provider=None,
+        concurrency=4,
+        timeout=30,
+        retries=3,
+    ):
+        self.url = url.rstrip("/")
+        self.collections = collections or []
+        self.page_size = page_size
+        self.name = name or self.url
+        self.provider = provider or self.name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+
+    def first_page(self, since: datetime = None) -> dict:
+        """Request for the first page of items acquired at or after since"""
+        if self.url.endswith(".json"):
+            return {"method": "GET", "href": self.url}
+
+        body = {
+            "limit": self.page_size,
+            "sortby": [{"field": "properties.datetime", "direction": "asc"}],
+        }
+        if self.collections:
+            body["collections"] = self.collections
+        if since:
+            body["datetime"] = f"{since.isoformat()}/.."
+        return {"method": "POST", "href": f"{self.url}/search", "body": body}
+
+    async def pages(
+        self,
+        session: aiohttp.ClientSession,
+        limit: asyncio.Semaphore,
+        since: datetime = None,
+        next_page: dict = None,
+    ) -> AsyncIterator[CatalogPage]:
+        """Yield pages of items, starting from next_page when resuming.
+
+        limit bounds the requests in flight to this catalog's provider.
+        """
+        request = next_page or self.first_page(since)
+
+        while request:
+            async with limit:
+                data = await self.fetch(session, request)
+
+            items = [
+                item
+                for item in data.get("features", [])
+                if not since or item_datetime(item) >= since
+            ]
+            request = self.next_request(data, request)
+            yield CatalogPage(items, request)
+
+    async def fetch(self, session: aiohttp.ClientSession, request: dict) -> dict:
+        """Send a page request, retrying transient failures with backoff"""
+        method = request.get("method", "GET").upper()
+
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.request(
+                    method,
+                    request["href"],
+                    json=request.get("body") if method == "POST" else None,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                ) as response:
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                    error = f"HTTP {response.status}"
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt < self.retries:
+                delay = 2**attempt + random.random()
+                logger.warning(
+                    f"Catalog request to {self.provider} failed ({error}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+        raise CatalogError(
+            f"Catalog request to {self.provider} failed after "
+            f"{self.retries + 1} attempts: {error}"
+        )
+
+    @staticmethod
+    def next_request(data: dict, request: dict) -> Optional[dict]:
+        """Build the request for the "next" link of a page, if any"""
+        link = next(
+            (link for link in data.get("links", []) if link.get("rel") == "next"),
+            None,
+        )
+        if not link:
+            return None
+
+        next_request = {"method": link.get("method", "GET"), "href": link["href"]}
+        if next_request["method"].upper() == "POST":
+            body = link.get("body", {})
+            if link.get("merge"):
+                body = {**request.get("body", {}), **body}
+            next_request["body"] = body
+        return next_request
+
+
+class LocalStacCatalog:
+    """STAC item collection file on disk, paged like a STAC API.
+
+    Used for development, tests and benchmarks. Pages resume after the
+    (datetime, id) of the last item returned.
+    """
+
+    def __init__(
+        self, path, collections=None, page_size=100, name=None, provider=None, **kwargs
+    ):
+        self.path = str(path)
+        self.collections = collections or []
+        self.page_size = page_size
+        self.name = name or f"file://{os.path.abspath(self.path)}"
+        self.provider = provider or self.name
+        self.concurrency = 1
+
+    def read_pages(
+        self, since: datetime = None, next_page: dict = None
+    ) -> List[CatalogPage]:
+        """Read every page of items, starting from next_page when resuming"""
+        with open(self.path) as f:
+            features = json.load(f).get("features", [])
+
+        items = sorted(
+            (
+                item
+                for item in features
+                if (not since or item_datetime(item) >= since)
+                and (not self.collections or item.get("collection") in self.collections)
+            ),
+            key=lambda item: (item_datetime(item), item["id"]),
+        )
+
+        if next_page:
+            after = (parse_datetime(next_page["after"][0]), next_page["after"][1])
+            items = [
+                item for item in items if (item_datetime(item), item["id"]) > after
+            ]
+
+        pages = []
+        for start in range(0, len(items), self.page_size):
+            page = items[start : start + self.page_size]
+            next_page = None
+            if start + self.page_size < len(items):
+                last = page[-1]
+                next_page = {"after": [item_datetime(last).isoformat(), last["id"]]}
+            pages.append(CatalogPage(page, next_page))
+        return pages
+
+    async def pages(
+        self,
+        session: aiohttp.ClientSession,
+        limit: asyncio.Semaphore,
+        since: datetime = None,
+        next_page: dict = None,
+    ) -> AsyncIterator[CatalogPage]:
+        """Yield pages of items, starting from next_page when resuming"""
+        async with limit:
+            pages = await asyncio.to_thread(self.read_pages, since, next_page)
+        for page in pages:
+            yield page
+
+
+def get_catalogs() -> list:
+    """One catalog per provider collection configured in SATELLITE_PROVIDERS.
+
+    Each is named "<provider>:<collection>", which keys its ingestion cursor.
+    """
+    catalogs = []
+
+    for provider, config in settings.SATELLITE_PROVIDERS.items():
+        url = config["url"]
+        options = {
+            "page_size": config.get("page_size", settings.SATELLITE_CATALOG_PAGE_SIZE),
+            "provider": provider,
+            "concurrency": config.get("concurrency", 4),
+            "timeout": config.get("timeout", 30),
+            "retries": config.get("retries", 3),
+        }
+
+        if url.startswith(("http://", "https://")):
+            catalog_class = StacCatalog
+        else:
+            catalog_class = LocalStacCatalog
+            if url.startswith("file://"):
+                url = url[len("file://") :]
+
+        for collection in config.get("collections") or [None]:
+            catalogs.append(
+                catalog_class(
+                    url,
+                    collections=[collection] if collection else [],
+                    name=f"{provider}:{collection}" if collection else provider,
+                    **options,
+                )
+            )
+
+    return catalogs
+
+
+def item_datetime(item: dict) -> datetime:
+    """Acquisition time of a STAC item"""
+    properties = item.get("properties", {})
+    return parse_datetime(properties.get("datetime") or properties["start_datetime"])
+
+
+def item_to_scene(item: dict, image_asset: str = None) -> Optional[dict]:
+    """Map a STAC item to SatelliteImage fields, or None if it is unusable"""
+    assets = item.get("assets", {})
+    image = assets.get(image_asset or settings.SATELLITE_CATALOG_IMAGE_ASSET)
+    if not image or not item.get("geometry"):
+        logger.warning(f"Skipping catalog item {item.get('id')} without image")
+        return None
+
+    geometry = GEOSGeometry(json.dumps(item["geometry"]), srid=4326)
+    if not isinstance(geometry, Polygon):
+        geometry = geometry.convex_hull
+
+    properties = item.get("properties", {})
+    satellite = properties.get("constellation") or properties.get("platform", "")
+
+    return {
+        "scene_id": item["id"],
+        "satellite": satellite.title()[:50],
+        "acquisition_date": item_datetime(item),
+        "cloud_coverage": float(properties.get("eo:cloud_cover") or 0.0),
+        "geometry": geometry,
+        "image_url": image["href"],
+        "thumbnail_url": assets.get("thumbnail", {}).get("href", ""),
+    }
@@ -0,0 +1,347 @@
+"""
+Vectorized change detection on before/after raster crops.
+
+Everything here operates on whole NumPy arrays: spectral indices, the change
+mask, connected-component labelling (done on horizontal pixel runs rather
+than pixels) and per-region statistics. Python-level loops only run over
+polygon edges, label-merge rounds and the final (small) list of regions.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from django.contrib.gis.geos import LineString
+
+# Approximate metres per degree, used to size pixels of geographic rasters
+METERS_PER_DEGREE = 111_320.0
+
+
+def normalized_difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Compute (a - b) / (a + b), returning NaN where the sum is zero"""
+    a = a.astype(np.float32, copy=False)
+    b = b.astype(np.float32, copy=False)
+    total = a + b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total != 0, (a - b) / total, np.nan).astype(np.float32)
+
+
+def ndvi(bands: Dict[str, np.ndarray]) -> np.ndarray:
+    """Normalized Difference Vegetation Index"""
+    return normalized_difference(bands["nir"], bands["red"])
+
+
+def ndbi(bands: Dict[str, np.ndarray]) -> np.ndarray:
+    """Normalized Difference Built-up Index"""
+    return normalized_difference(bands["swir"], bands["nir"])
+
+
+def change_score(
+    before: Dict[str, np.ndarray], after: Dict[str, np.ndarray], index: str = "ndvi"
+) -> np.ndarray:
+    """Per-pixel change score where positive values indicate encroachment.
+
+    "ndvi" scores vegetation loss (before - after), "ndbi" scores built-up
+    gain (after - before) and "combined" takes the stronger of the two.
+    """
+    if index == "ndvi":
+        return ndvi(before) - ndvi(after)
+    if index == "ndbi":
+        return ndbi(after) - ndbi(before)
+    if index == "combined":
+        return np.fmax(ndvi(before) - ndvi(after), ndbi(after) - ndbi(before))
+    raise ValueError(f"Unknown spectral index: {index}")
+
+
+def pixel_centers(geotransform: tuple, shape: Tuple[int, int]):
+    """Return the x coordinates of column centres and y of row centres"""
+    origin_x, scale_x, _, origin_y, _, scale_y = geotransform
+    height, width = shape
+    xs = origin_x + (np.arange(width) + 0.5) * scale_x
+    ys = origin_y + (np.arange(height) + 0.5) * scale_y
+    return xs, ys
+
+
+def rasterize_polygon(polygon, geotransform: tuple, shape: Tuple[int, int]):
+    """Build a boolean mask of pixels whose centres fall inside the polygon.
+
+    Uses even-odd scanline filling: for every edge, the rows it crosses and
+    the column where it crosses them are computed as arrays, and crossing
+    parity is accumulated with a cumulative sum along each row.
+    """
+    xs, ys = pixel_centers(geotransform, shape)
+    height, width = shape
+    ascending = xs[-1] >= xs[0] if width > 1 else True
+    sorted_xs = xs if ascending else xs[::-1]
+
+    crossings = np.zeros((height, width + 1), dtype=np.int32)
+
+    for ring in polygon:
+        coords = np.asarray(ring.coords, dtype=np.float64)
+        x1, y1 = coords[:-1, 0], coords[:-1, 1]
+        x2, y2 = coords[1:, 0], coords[1:, 1]
+
+        # (edge, row) pairs where the row's centre line crosses the edge
+        spans = (y1[:, None] > ys[None, :]) != (y2[:, None] > ys[None, :])
+        edge_idx, row_idx = np.nonzero(spans)
+        if not len(edge_idx):
+            continue
+
+        ex1, ey1 = x1[edge_idx], y1[edge_idx]
+        ex2, ey2 = x2[edge_idx], y2[edge_idx]
+        cross_x = ex1 + (ys[row_idx] - ey1) * (ex2 - ex1) / (ey2 - ey1)
+
+        # Pixels whose centre lies left of the crossing point are toggled
+        if ascending:
+            cols = np.searchsorted(sorted_xs, cross_x, side="left")
+            np.add.at(crossings, (row_idx, np.zeros_like(cols)), 1)
+            np.add.at(crossings, (row_idx, cols), -1)
+        else:
+            cols = width - np.searchsorted(sorted_xs, cross_x, side="left")
+            np.add.at(crossings, (row_idx, cols), 1)
+
+    return (np.cumsum(crossings[:, :width], axis=1) % 2).astype(bool)
+
+
+def find_runs(mask: np.ndarray):
+    """Find horizontal runs of True pixels.
+
+    Returns (rows, starts, ends) arrays ordered by row then start column, with
+    ends exclusive.
+    """
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def label_runs(rows, starts, ends, width: int, connectivity: int = 8) -> np.ndarray:
+    """Assign a connected-component label (0..n-1) to every run.
+
+    Runs on adjacent rows that touch are linked, then labels are merged with
+    vectorized hook-and-shortcut union-find until all links agree.
+    """
+    count = len(rows)
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+
+    reach = 1 if connectivity == 8 else 0
+    stride = width + 2
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+
+    # For each run, the contiguous range of touching runs on the previous row
+    prev_row = (rows - 1) * stride
+    lo = np.searchsorted(end_keys, prev_row + starts - reach, side="right")
+    hi = np.searchsorted(start_keys, prev_row + ends + reach, side="left")
+    links = np.clip(hi - lo, 0, None)
+    links[rows == 0] = 0
+
+    total = int(links.sum())
+    labels = np.arange(count, dtype=np.int64)
+    if not total:
+        return labels
+
+    b = np.repeat(np.arange(count), links)
+    offsets = np.arange(total) - np.repeat(np.cumsum(links) - links, links)
+    a = np.repeat(lo, links) + offsets
+
+    while True:
+        label_a, label_b = labels[a], labels[b]
+        if np.array_equal(label_a, label_b):
+            break
+        merged = np.minimum(label_a, label_b)
+        np.minimum.at(labels, label_a, merged)
+        np.minimum.at(labels, label_b, merged)
+        while True:
+            shortcut = labels[labels]
+            if np.array_equal(shortcut, labels):
+                break
+            labels = shortcut
+
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels
+
+
+def pixel_area_m2(geotransform: tuple, srid: int, latitudes: np.ndarray):
+    """Area of one pixel in square metres at the given latitudes"""
+    _, scale_x, _, _, _, scale_y = geotransform
+    return _pixel_area_m2(scale_x, scale_y, srid, latitudes)
+
+
+def _pixel_area_m2(scale_x, scale_y, srid: int, latitudes: np.ndarray):
+    area = np.abs(scale_x * scale_y)
+    if srid == 4326:
+        return area * METERS_PER_DEGREE**2 * np.cos(np.radians(latitudes))
+    return np.broadcast_to(area, np.shape(latitudes)).astype(np.float64)
+
+
+def stack_crops(crops: List[np.ndarray], fill=0) -> np.ndarray:
+    """Stack 2-D crops of different sizes into one (n, height, width) array,
+    padding each at the bottom/right with fill"""
+    height = max(crop.shape[0] for crop in crops)
+    width = max(crop.shape[1] for crop in crops)
+    dtype = np.result_type(*crops)
+    stacked = np.full((len(crops), height, width), fill, dtype=dtype)
+    for i, crop in enumerate(crops):
+        stacked[i, : crop.shape[0], : crop.shape[1]] = crop
+    return stacked
+
+
+def detect_changes(
+    before: Dict[str, np.ndarray],
+    after: Dict[str, np.ndarray],
+    geotransform: tuple,
+    srid: int = 4326,
+    mask: np.ndarray = None,
+    **options,
+) -> List[dict]:
+    """Detect changed regions between two co-registered raster crops.
+
+    before/after map band names ("red", "nir", "swir") to 2-D arrays of the
+    same shape; mask optionally restricts analysis to pixels inside the AOI.
+    Returns up to max_regions dicts, largest first, each with the region's
+    footprint polygon (convex hull in the raster's CRS), pixel count, area in
+    square metres, mean change and confidence.
+    """
+    if mask is None:
+        mask = np.ones(next(iter(after.values())).shape, dtype=bool)
+
+    return detect_changes_batch(
+        {name: band[None] for name, band in before.items()},
+        {name: band[None] for name, band in after.items()},
+        [geotransform],
+        mask[None],
+        srid=srid,
+        **options,
+    )[0]
+
+
+def detect_changes_batch(
+    before: Dict[str, np.ndarray],
+    after: Dict[str, np.ndarray],
+    geotransforms: List[tuple],
+    masks: np.ndarray,
+    srid: int = 4326,
+    index: str = "ndvi",
+    threshold: float = 0.2,
+    min_pixels: int = 9,
+    max_regions: int = 100,
+    connectivity: int = 8,
+) -> List[List[dict]]:
+    """Detect changed regions for a batch of crops in one pass.
+
+    Band arrays and masks are (n, height, width) stacks of padded crops (see
+    stack_crops), with geotransforms giving each crop's position. The whole
+    batch is scored and labelled at once, with an empty row between crops so
+    regions never join across them. Returns one region list per crop, as
+    described in detect_changes.
+    """
+    count, height, width = masks.shape
+    score = change_score(before, after, index)
+    changed = (np.nan_to_num(score, nan=0.0) > threshold) & masks
+
+    # Lay the crops out top to bottom, separated by one empty row
+    item_height = height + 1
+    layout = np.zeros((count, item_height, width), dtype=bool)
+    layout[:, :height] = changed
+    layout = layout.reshape(count * item_height, width)
+
+    rows, starts, ends = find_runs(layout)
+    results = [[] for _ in range(count)]
+    if not len(rows):
+        return results
+
+    labels = label_runs(rows, starts, ends, width, connectivity)
+    region_count = int(labels.max()) + 1
+    run_item = rows // item_height
+    local_rows = rows % item_height
+
+    transforms = np.asarray(geotransforms, dtype=np.float64)
+    origin_x, scale_x = transforms[run_item, 0], transforms[run_item, 1]
+    origin_y, scale_y = transforms[run_item, 3], transforms[run_item, 5]
+
+    # Per-run statistics from row-wise cumulative sums of the score
+    lengths = ends - starts
+    cumulative = np.zeros((count * item_height, width + 1), dtype=np.float64)
+    scores = np.zeros((count, item_height, width), dtype=np.float64)
+    scores[:, :height] = np.where(changed, score, 0.0)
+    np.cumsum(scores.reshape(-1, width), axis=1, out=cumulative[:, 1:])
+    run_score = cumulative[rows, ends] - cumulative[rows, starts]
+
+    run_lat = origin_y + (local_rows + 0.5) * scale_y
+    run_area = lengths * _pixel_area_m2(scale_x, scale_y, srid, run_lat)
+
+    pixel_count = np.bincount(labels, weights=lengths, minlength=region_count)
+    area_m2 = np.bincount(labels, weights=run_area, minlength=region_count)
+    mean_change = (
+        np.bincount(labels, weights=run_score, minlength=region_count) / pixel_count
+    )
+    # Confidence grows with how far the mean change clears the threshold
+    confidence = 1.0 - np.exp(-2.0 * (mean_change / threshold - 1.0))
+    confidence = np.clip(confidence, 0.0, 0.99)
+
+    region_item = np.zeros(region_count, dtype=np.int64)
+    region_item[labels] = run_item
+
+    # Keep the largest regions above the minimum size, per crop
+    selected = np.nonzero(pixel_count >= min_pixels)[0]
+    selected = selected[np.lexsort((-area_m2[selected], region_item[selected]))]
+    item_starts = np.searchsorted(region_item[selected], np.arange(count))
+    rank = np.arange(len(selected)) - item_starts[region_item[selected]]
+    selected = selected[rank < max_regions]
+    if not len(selected):
+        return results
+
+    # Only each region's leftmost start and rightmost end per row can lie on
+    # its convex hull, so reduce runs to one span per (region, row)
+    region_rows = labels * (count * item_height) + rows
+    order = np.argsort(region_rows, kind="stable")
+    sorted_keys = region_rows[order]
+    first = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+    last = np.concatenate((first[1:], [True]))
+    span_region = labels[order][first]
+    span_runs = order[first]
+    span_row = local_rows[span_runs]
+    span_start = starts[span_runs]
+    span_end = ends[order][last]
+
+    span_bounds = np.searchsorted(span_region, np.arange(region_count + 1))
+    corner_x = origin_x[span_runs, None] + (
+        np.stack([span_start, span_end, span_start, span_end], axis=1)
+        * scale_x[span_runs, None]
+    )
+    corner_y = origin_y[span_runs, None] + (
+        np.stack([span_row, span_row, span_row + 1, span_row + 1], axis=1)
+        * scale_y[span_runs, None]
+    )
+
+    for region in selected:
+        spans = slice(span_bounds[region], span_bounds[region + 1])
+        points = np.column_stack([corner_x[spans].ravel(), corner_y[spans].ravel()])
+        results[region_item[region]].append(
+            {
+                "polygon": LineString(points, srid=srid).convex_hull,
+                "pixel_count": int(pixel_count[region]),
+                "area_m2": float(area_m2[region]),
+                "mean_change": float(mean_change[region]),
+                "confidence": float(confidence[region]),
+            }
+        )
+
+    return results
+
+
+def summarize_changes(regions: List[dict], mask_area_m2: float) -> dict:
+    """Summarize detected regions relative to the analysed area"""
+    changed_area = sum(region["area_m2"] for region in regions)
+    return {
+        "change_detected": bool(regions),
+        "confidence": max((region["confidence"] for region in regions), default=0.0),
+        "region_count": len(regions),
+        "affected_area_m2": changed_area,
+        "affected_area_percentage": (
+            100.0 * changed_area / mask_area_m2 if mask_area_m2 else 0.0
+        ),
+    }
@@ -0,0 +1,120 @@
+"""
+Per-thread cache of AOI geometries and rasterized AOI masks.
+
+Entries are keyed by AOI id and updated_at, so an edited AOI misses the
+cache and its old entries age out of the LRU. Geometries are cached per
+SRID together with their extent and a prepared GEOS geometry, which makes
+repeated intersects/contains tests against the same AOI cheap. Masks are
+cached per pixel grid (geotransform and shape) and returned read-only.
+Prepared geometries are not safe to share between threads, so each worker
+thread has its own cache.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.geos.prepared import PreparedGeometry
+
+from .detection import rasterize_polygon
+
+# Rough bytes per coordinate of a GEOS geometry and its prepared index
+BYTES_PER_COORD = 64
+
+
+class AoiGeometry(NamedTuple):
+    geometry: GEOSGeometry
+    prepared: PreparedGeometry
+    extent: Tuple[float, float, float, float]
+
+
+class AoiGeometryCache:
+    """Size-bounded in-memory LRU cache of AOI geometries and masks"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def aoi_key(aoi) -> tuple:
+        return (str(aoi.id), aoi.updated_at)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        """Store a value, evicting least recently used entries when over size"""
+        if nbytes > self.max_bytes:
+            return
+
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= old[1]
+
+        self.entries[key] = (value, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            _, (_, evicted_bytes) = self.entries.popitem(last=False)
+            self.size -= evicted_bytes
+
+    def geometry(self, aoi, srid: int = None) -> AoiGeometry:
+        """AOI geometry in srid (default the AOI's own), prepared for predicates"""
+        srid = srid or aoi.geometry.srid
+        key = ("geometry", *self.aoi_key(aoi), srid)
+
+        cached = self.get(key)
+        if cached is None:
+            geometry = aoi.geometry
+            if geometry.srid != srid:
+                geometry = geometry.transform(srid, clone=True)
+            cached = AoiGeometry(geometry, geometry.prepared, geometry.extent)
+            self.put(key, cached, geometry.num_coords * BYTES_PER_COORD)
+
+        return cached
+
+    def mask(self, aoi, srid: int, geotransform: tuple, shape) -> np.ndarray:
+        """Read-only mask of the pixels of a grid whose centres are in the AOI"""
+        key = ("mask", *self.aoi_key(aoi), srid, tuple(geotransform), tuple(shape))
+
+        mask = self.get(key)
+        if mask is None:
+            geometry = self.geometry(aoi, srid).geometry
+            mask = rasterize_polygon(geometry, geotransform, shape)
+            mask.flags.writeable = False
+            self.put(key, mask, mask.nbytes)
+
+        return mask
+
+    def intersects(self, aoi, other: GEOSGeometry) -> bool:
+        """Whether other intersects the AOI, using its prepared geometry"""
+        return self.geometry(aoi, other.srid).prepared.intersects(other)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+
+_caches = threading.local()
+
+
+def get_aoi_geometry_cache() -> AoiGeometryCache:
+    """This thread's AOI geometry cache, sized by AOI_GEOMETRY_CACHE_MAX_BYTES"""
+    cache = getattr(_caches, "geometry", None)
+    if cache is None:
+        cache = _caches.geometry = AoiGeometryCache(
+            settings.AOI_GEOMETRY_CACHE_MAX_BYTES
+        )
+    return cache
@@ -0,0 +1,352 @@
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import django
+import numpy as np
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.gis.gdal import GDALRaster
+from django.contrib.gis.geos import Polygon
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from aoi.models import Aoi, EncroachmentDetection
+from notifications.models import Notification
+from notifications.services import NotificationService
+from monitoring.models import MonitoringJob, ProcessedScene, SatelliteImage
+from monitoring.raster import get_raster_reader
+from monitoring.services import (
+    EncroachmentDetectionService,
+    MonitoringSchedulerService,
+    SatelliteImageService,
+)
+from monitoring.tasks import schedule_monitoring_jobs
+
+User = get_user_model()
+
+# Synthetic scenes tile a grid of this size (degrees) south-east of origin
+ORIGIN = (3.0, 6.6)
+TILE_SIZE = 0.1
+# Approximate metres per degree at the synthetic scenes' latitude
+METRES_PER_DEGREE = 111_000
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the monitoring pipeline on synthetic users, AOIs and scenes. "
+        "Data is created in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--aois", type=int, default=100)
+        parser.add_argument(
+            "--scenes", type=int, default=4, help="Scene tiles, each imaged twice"
+        )
+        parser.add_argument(
+            "--aoi-size",
+            type=float,
+            default=500,
+            help="Typical AOI width in metres; sizes vary from half to twice this",
+        )
+        parser.add_argument(
+            "--pixel-size", type=float, default=2e-4, help="Scene pixel size (deg)"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            help="JSON results file (default benchmarks/monitoring-<time>.json)",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.np_rng = np.random.default_rng(options["seed"])
+        self.results = {
+            "benchmark": "monitoring",
+            "started_at": timezone.now().isoformat(),
+            "parameters": {
+                key: options[key]
+                for key in ["users", "aois", "scenes", "aoi_size", "pixel_size", "seed"]
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "cpu_count": os.cpu_count(),
+                "detection_pool_size": settings.MONITORING_DETECTION_POOL_SIZE,
+            },
+            "stages": {},
+        }
+
+        eager = current_app.conf.task_always_eager
+        propagates = current_app.conf.task_eager_propagates
+        current_app.conf.task_always_eager = True
+        current_app.conf.task_eager_propagates = True
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            RASTER_CACHE_DIR=os.path.join(directory, "tiles"),
+            CHANNEL_LAYERS={
+                "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+            },
+            TWILIO_ACCOUNT_SID="",
+        ):
+            get_raster_reader.cache_clear()
+            try:
+                with transaction.atomic():
+                    self.run(directory, options)
+                    raise Rollback
+            except Rollback:
+                pass
+            finally:
+                current_app.conf.task_always_eager = eager
+                current_app.conf.task_eager_propagates = propagates
+                get_raster_reader.cache_clear()
+
+        self.write_results(options["output"])
+
+    def run(self, directory, options):
+        self.stdout.write("Generating synthetic data...")
+        with self.stage("setup", options["aois"]):
+            aois = self.create_data(directory, options)
+
+        now = timezone.now()
+        aoi_ids = []
+        with self.stage("schedule", len(aois)):
+            while True:
+                claimed = MonitoringSchedulerService.claim_due_aois(now, limit=500)
+                if not claimed:
+                    break
+                jobs = MonitoringSchedulerService.create_jobs(
+                    [aoi.id for aoi in claimed]
+                )
+                aoi_ids += list(jobs)
+
+        aois = list(Aoi.objects.select_related("user").filter(id__in=aoi_ids))
+        start_date = now - timedelta(days=7)
+
+        with self.stage("image_lookup", len(aois)):
+            images = {
+                aoi.id: SatelliteImageService.get_images_for_aoi(
+                    aoi, start_date=start_date
+                )
+                for aoi in aois
+            }
+
+        reader = get_raster_reader()
+        with self.stage("detection", len(aois)) as stage:
+            results = {
+                aoi.id: EncroachmentDetectionService.detect_encroachment_images(
+                    aoi, images[aoi.id]
+                )
+                for aoi in aois
+            }
+            stage["images_analysed"] = sum(len(result) for result in results.values())
+        self.results["stages"]["detection"].update(
+            bytes_read=reader.bytes_read,
+            cache_hits=reader.cache_hits,
+            cache_misses=reader.cache_misses,
+        )
+
+        encroachments = {
+            aoi.id: [
+                encroachment
+                for image_encroachments in results[aoi.id].values()
+                for encroachment in image_encroachments
+            ]
+            for aoi in aois
+        }
+        with self.stage("persistence", len(aois)) as stage:
+            for aoi in aois:
+                with transaction.atomic():
+                    EncroachmentDetection.objects.bulk_create(encroachments[aoi.id])
+                    SatelliteImageService.mark_images_processed(
+                        aoi,
+                        [
+                            image
+                            for image in images[aoi.id]
+                            if str(image.id) in results[aoi.id]
+                        ],
+                    )
+            stage["encroachments"] = sum(map(len, encroachments.values()))
+
+        with self.stage("notifications", len(aois)) as stage:
+            stage["notifications"] = sum(
+                len(
+                    NotificationService.create_encroachment_notifications(
+                        encroachments[aoi.id]
+                    )
+                )
+                for aoi in aois
+            )
+
+        # Full run through the scheduler task with Celery in eager mode
+        Notification.objects.filter(aoi__in=aois).delete()
+        EncroachmentDetection.objects.filter(aoi__in=aois).delete()
+        ProcessedScene.objects.filter(aoi__in=aois).delete()
+        MonitoringJob.objects.filter(aoi__in=aois).delete()
+        Aoi.objects.filter(id__in=aoi_ids).update(next_run_at=now)
+
+        with self.stage("pipeline", len(aois)) as stage:
+            stage.update(schedule_monitoring_jobs())
+
+    def create_data(self, directory, options):
+        now = timezone.now()
+        pixel_size = options["pixel_size"]
+        columns = max(int(np.ceil(np.sqrt(options["scenes"]))), 1)
+
+        tiles = []
+        images = []
+        for index in range(options["scenes"]):
+            x0 = ORIGIN[0] + (index % columns) * TILE_SIZE
+            y1 = ORIGIN[1] - (index // columns) * TILE_SIZE
+            footprint = Polygon.from_bbox((x0, y1 - TILE_SIZE, x0 + TILE_SIZE, y1))
+            tiles.append(footprint)
+
+            before, after = self.synthetic_bands(int(round(TILE_SIZE / pixel_size)))
+            for name, bands, acquired in [
+                ("reference", before, now - timedelta(days=10)),
+                ("latest", after, now - timedelta(days=1)),
+            ]:
+                scene_id = f"BENCH_{index:04d}_{name}"
+                path = os.path.join(directory, f"{scene_id}.tif")
+                self.write_scene(path, bands, (x0, y1), pixel_size)
+                images.append(
+                    SatelliteImage(
+                        scene_id=scene_id,
+                        satellite="Sentinel-2",
+                        acquisition_date=acquired,
+                        cloud_coverage=5.0,
+                        geometry=footprint,
+                        image_url=f"file://{path}",
+                    )
+                )
+        SatelliteImage.objects.bulk_create(images)
+
+        users = User.objects.bulk_create(
+            [
+                User(email=f"benchmark-{index}@example.com", password="!")
+                for index in range(options["users"])
+            ]
+        )
+
+        aois = []
+        for index in range(options["aois"]):
+            tile = self.rng.choice(tiles)
+            aois.append(
+                Aoi(
+                    user=self.rng.choice(users),
+                    name=f"Benchmark AOI {index}",
+                    geometry=self.random_polygon(tile, options["aoi_size"]),
+                    monitoring_type=self.rng.choice(["daily", "monthly", "yearly"]),
+                    status="active",
+                    is_paid=True,
+                    start_date=now - timedelta(days=1),
+                    end_date=now + timedelta(days=30),
+                    next_run_at=now - timedelta(minutes=1),
+                )
+            )
+        return Aoi.objects.bulk_create(aois)
+
+    def random_polygon(self, tile: Polygon, size_m: float) -> Polygon:
+        """Irregular polygon of roughly size_m across, inside tile"""
+        radius = size_m * self.rng.uniform(0.5, 2.0) / 2 / METRES_PER_DEGREE
+        xmin, ymin, xmax, ymax = tile.extent
+        cx = self.rng.uniform(xmin + radius, xmax - radius)
+        cy = self.rng.uniform(ymin + radius, ymax - radius)
+
+        vertices = self.rng.randint(5, 12)
+        angles = sorted(self.rng.uniform(0, 2 * np.pi) for _ in range(vertices))
+        ring = [
+            (
+                cx + radius * self.rng.uniform(0.6, 1.0) * np.cos(angle),
+                cy + radius * self.rng.uniform(0.6, 1.0) * np.sin(angle),
+            )
+            for angle in angles
+        ]
+        return Polygon(ring + ring[:1], srid=4326)
+
+    def synthetic_bands(self, size: int):
+        """Vegetated before bands, and after bands with built-up patches"""
+        noise = self.np_rng.normal(0, 0.02, (3, size, size)).astype(np.float32)
+        before = {
+            "red": 0.05 + noise[0],
+            "nir": 0.45 + noise[1],
+            "swir": 0.15 + noise[2],
+        }
+        after = {name: band.copy() for name, band in before.items()}
+
+        for _ in range(max(size // 20, 1)):
+            height, width = self.np_rng.integers(3, 20, size=2)
+            row, col = self.np_rng.integers(0, size - 20, size=2)
+            patch = (slice(row, row + height), slice(col, col + width))
+            after["red"][patch] = 0.25
+            after["nir"][patch] = 0.2
+            after["swir"][patch] = 0.35
+
+        return before, after
+
+    def write_scene(self, path, bands, origin, pixel_size):
+        size = bands["red"].shape[0]
+        GDALRaster(
+            {
+                "driver": "GTiff",
+                "name": path,
+                "srid": 4326,
+                "width": size,
+                "height": size,
+                "origin": list(origin),
+                "scale": [pixel_size, -pixel_size],
+                "datatype": 6,
+                "bands": [{"data": bands[name]} for name in ["red", "nir", "swir"]],
+                "papsz_options": {
+                    "tiled": "yes",
+                    "blockxsize": 256,
+                    "blockysize": 256,
+                },
+            }
+        )
+
+    @contextmanager
+    def stage(self, name, aois):
+        """Time a stage and count its queries"""
+        details = {}
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            yield details
+            seconds = time.perf_counter() - started
+
+        self.results["stages"][name] = {
+            "seconds": round(seconds, 4),
+            "queries": len(queries),
+            "aois": aois,
+            "aois_per_minute": round(aois / seconds * 60, 1) if seconds else None,
+            "queries_per_aoi": round(len(queries) / aois, 2) if aois else None,
+            **details,
+        }
+        self.stdout.write(
+            f"{name:>14}: {seconds:8.3f}s {len(queries):6d} queries "
+            f"({self.results['stages'][name]['aois_per_minute']} AOIs/min)"
+        )
+
+    def write_results(self, output):
+        if not output:
+            os.makedirs("benchmarks", exist_ok=True)
+            output = os.path.join(
+                "benchmarks", f"monitoring-{timezone.now():%Y%m%dT%H%M%S}.json"
+            )
+
+        with open(output, "w") as f:
+            json.dump(self.results, f, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
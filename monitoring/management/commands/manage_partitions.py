@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from asset_watch.partitioning import drop_expired_partitions, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions of the notification and "
+        "encroachment_detection tables, and optionally drop expired ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.PARTITION_MONTHS_AHEAD,
+            help="Months after the current one to create partitions for",
+        )
+        parser.add_argument(
+            "--drop-expired",
+            action="store_true",
+            help="Drop partitions older than the configured retention periods",
+        )
+
+    def handle(self, *args, **options):
+        for name in ensure_partitions(options["months_ahead"]):
+            self.stdout.write(f"Created {name}")
+
+        if options["drop_expired"]:
+            for name in drop_expired_partitions():
+                self.stdout.write(f"Dropped {name}")
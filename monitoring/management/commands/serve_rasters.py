@@ -0,0 +1,86 @@
+import os
+import re
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Static file handler that honours single HTTP Range requests"""
+
+    range_remaining = None
+
+    def send_head(self):
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start, end = match.groups()
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end or 0), 0)
+            end = size - 1
+
+        if start >= size or start > end:
+            self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = self.range_remaining
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+        self.range_remaining = None
+
+    def end_headers(self):
+        self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+
+class Command(BaseCommand):
+    help = "Serve a directory of GeoTIFFs over HTTP with Range request support"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory to serve")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument("--bind", default="127.0.0.1")
+
+    def handle(self, *args, **options):
+        handler = partial(RangeRequestHandler, directory=options["directory"])
+        server = ThreadingHTTPServer((options["bind"], options["port"]), handler)
+
+        self.stdout.write(
+            f"Serving {options['directory']} on "
+            f"http://{options['bind']}:{options['port']}/"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0001_initial"),
+        ("monitoring", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="monitoringjob",
+            index=models.Index(
+                fields=["aoi", "status", "completed_at"],
+                name="monitoring_job_aoi_status_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:26
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0001_initial"),
+        ("monitoring", "0002_monitoringjob_aoi_status_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProcessedScene",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("processed_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "aoi",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="processed_scenes",
+                        to="aoi.aoi",
+                    ),
+                ),
+                (
+                    "satellite_image",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="processed_scenes",
+                        to="monitoring.satelliteimage",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "processed_scene",
+                "ordering": ["-processed_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("aoi", "satellite_image"), name="unique_processed_scene"
+                    )
+                ],
+            },
+        ),
+    ]
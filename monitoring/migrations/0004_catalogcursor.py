@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:37
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0003_processedscene"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogCursor",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("catalog", models.CharField(max_length=255, unique=True)),
+                ("next_page", models.JSONField(blank=True, null=True)),
+                ("last_acquired_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "catalog_cursor",
+            },
+        ),
+    ]
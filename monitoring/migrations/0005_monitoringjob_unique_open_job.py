@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0002_aoi_next_run_at"),
+        ("monitoring", "0004_catalogcursor"),
+    ]
+
+    operations = [
+        # Keep only the latest open job per AOI so the constraint can be added
+        migrations.RunSQL(
+            """
+            UPDATE monitoring_job
+            SET status = 'failed',
+                completed_at = now(),
+                error_message = 'Superseded by a newer open job'
+            WHERE status IN ('pending', 'running')
+              AND id NOT IN (
+                  SELECT DISTINCT ON (aoi_id) id
+                  FROM monitoring_job
+                  WHERE status IN ('pending', 'running')
+                  ORDER BY aoi_id, started_at DESC
+              )
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="monitoringjob",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=("aoi",),
+                name="unique_open_monitoring_job",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0005_monitoringjob_unique_open_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monitoringjob",
+            name="stage_metrics",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
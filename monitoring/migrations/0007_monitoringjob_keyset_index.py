@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0006_monitoringjob_stage_metrics"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="monitoringjob",
+            index=models.Index(
+                fields=["started_at", "id"], name="monitoring_job_started_id_idx"
+            ),
+        ),
+    ]
@@ -49,10 +49,72 @@ class MonitoringJob(models.Model):
     error_message = models.TextField(blank=True)
     images_processed = models.IntegerField(default=0)
     encroachments_detected = models.IntegerField(default=0)
+    # Per-stage durations, query counts and peak RSS growth, raster bytes read
+    # and peak resident memory over the run
+    stage_metrics = models.JSONField(default=dict, blank=True)
 
     class Meta:
         db_table = "monitoring_job"
         ordering = ["-started_at"]
+        indexes = [
+            models.Index(
+                fields=["aoi", "status", "completed_at"],
+                name="monitoring_job_aoi_status_idx",
+            ),
+            # Keyset pagination
+            models.Index(
+                fields=["started_at", "id"], name="monitoring_job_started_id_idx"
+            ),
+        ]
+        constraints = [
+            # At most one pending or running job per AOI
+            models.UniqueConstraint(
+                fields=["aoi"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="unique_open_monitoring_job",
+            ),
+        ]
 
     def __str__(self):
         return f"Monitoring Job {self.id} - {self.aoi.name}"
+
+
+class ProcessedScene(models.Model):
+    """Ledger of satellite images already analysed for an AOI"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    aoi = models.ForeignKey(
+        "aoi.Aoi", on_delete=models.CASCADE, related_name="processed_scenes"
+    )
+    satellite_image = models.ForeignKey(
+        SatelliteImage, on_delete=models.CASCADE, related_name="processed_scenes"
+    )
+    processed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "processed_scene"
+        ordering = ["-processed_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["aoi", "satellite_image"], name="unique_processed_scene"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.satellite_image.scene_id} processed for {self.aoi.name}"
+
+
+class CatalogCursor(models.Model):
+    """Resumable position of scene ingestion from a satellite catalog"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    catalog = models.CharField(max_length=255, unique=True)
+    next_page = models.JSONField(null=True, blank=True)
+    last_acquired_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "catalog_cursor"
+
+    def __str__(self):
+        return f"{self.catalog} at {self.last_acquired_at}"
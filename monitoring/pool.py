@@ -0,0 +1,213 @@
+"""
+Worker-local process pool for CPU-bound change detection.
+
+Raster arrays are copied once into shared memory segments and handed to the
+pool processes by name, so only small descriptors and the resulting regions
+are pickled.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict
+
+import numpy as np
+from django.conf import settings
+
+from .detection import detect_changes
+
+logger = logging.getLogger(__name__)
+
+# Seconds to run inline after the pool failed to start before trying again
+POOL_RETRY_SECONDS = 300
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_retry_at = 0.0
+
+
+class SharedArrays:
+    """Copy named arrays into shared memory segments owned by this process"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.segments = []
+        self.descriptors = {}
+
+        try:
+            for name, array in arrays.items():
+                array = np.ascontiguousarray(array)
+                segment = shared_memory.SharedMemory(
+                    create=True, size=max(array.nbytes, 1)
+                )
+                self.segments.append(segment)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = (
+                    array
+                )
+                self.descriptors[name] = (segment.name, array.shape, array.dtype.str)
+        except Exception:
+            self.release()
+            raise
+
+    def release(self, *args) -> None:
+        """Free the segments; safe to call more than once"""
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def _attach(descriptors):
+    segments = []
+    arrays = {}
+    for name, (segment_name, shape, dtype) in descriptors.items():
+        # Pool processes share the submitting process's resource tracker, so
+        # attaching here does not take ownership; the submitter unlinks
+        segment = shared_memory.SharedMemory(name=segment_name)
+        segments.append(segment)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    return arrays, segments
+
+
+def _detect_changes_shared(descriptors, geotransform, srid, options):
+    arrays, segments = _attach(descriptors)
+    before = after = None
+    try:
+        before = {
+            name[len("before:") :]: array
+            for name, array in arrays.items()
+            if name.startswith("before:")
+        }
+        after = {
+            name[len("after:") :]: array
+            for name, array in arrays.items()
+            if name.startswith("after:")
+        }
+        return detect_changes(
+            before, after, geotransform, srid=srid, mask=arrays["mask"], **options
+        )
+    finally:
+        # Views into the segments must go before the segments can close
+        del arrays, before, after
+        for segment in segments:
+            segment.close()
+
+
+def _warm_up():
+    return True
+
+
+def get_detection_pool():
+    """Get this worker's detection pool, or None when running inline.
+
+    The pool is created on first use with MONITORING_DETECTION_POOL_SIZE
+    processes and shared by the worker's threads. Daemonic processes, such
+    as the children of Celery's prefork pool, cannot start processes, so the
+    monitoring worker runs with -P threads or -P solo; in a daemonic process
+    detection runs inline. If the pool fails to start, detection runs inline
+    for POOL_RETRY_SECONDS before it is tried again.
+    """
+    global _pool, _pool_retry_at
+
+    if _pool is not None:
+        return _pool
+
+    size = settings.MONITORING_DETECTION_POOL_SIZE
+    if size < 1 or time.monotonic() < _pool_retry_at:
+        return None
+
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        if time.monotonic() < _pool_retry_at:
+            return None
+
+        if multiprocessing.current_process().daemon:
+            logger.warning(
+                "Detection process pool cannot start in a daemonic process, "
+                "running inline; run the worker with -P threads or -P solo"
+            )
+            _pool_retry_at = float("inf")
+            return None
+
+        pool = None
+        try:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["monitoring.detection"])
+            pool = ProcessPoolExecutor(max_workers=size, mp_context=context)
+            pool.submit(_warm_up).result(timeout=60)
+        except Exception as e:
+            logger.warning(f"Detection process pool unavailable, running inline: {e}")
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            _pool_retry_at = time.monotonic() + POOL_RETRY_SECONDS
+            return None
+
+        _pool = pool
+        return _pool
+
+
+def reset_detection_pool() -> None:
+    """Shut down the pool so the next call to get_detection_pool rebuilds it"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def submit_detection(prepared: dict, options: dict) -> Future:
+    """Run detect_changes for a prepared analysis on the pool.
+
+    prepared holds the before/after band arrays, mask, geotransform and srid
+    (see EncroachmentDetectionService.prepare_analysis). Returns a future of
+    the detected regions; without a pool the work runs inline and the
+    returned future is already resolved.
+    """
+    pool = get_detection_pool()
+
+    if pool is None:
+        future = Future()
+        try:
+            future.set_result(
+                detect_changes(
+                    prepared["before"],
+                    prepared["after"],
+                    prepared["geotransform"],
+                    srid=prepared["srid"],
+                    mask=prepared["mask"],
+                    **options,
+                )
+            )
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    shared = SharedArrays(
+        {
+            **{f"before:{name}": band for name, band in prepared["before"].items()},
+            **{f"after:{name}": band for name, band in prepared["after"].items()},
+            "mask": prepared["mask"],
+        }
+    )
+    try:
+        future = pool.submit(
+            _detect_changes_shared,
+            shared.descriptors,
+            prepared["geotransform"],
+            prepared["srid"],
+            options,
+        )
+    except BrokenProcessPool:
+        shared.release()
+        reset_detection_pool()
+        raise
+    except Exception:
+        shared.release()
+        raise
+
+    future.add_done_callback(shared.release)
+    return future
@@ -0,0 +1,70 @@
+"""
+Per-stage timing and resource metrics for monitoring jobs.
+
+A JobMetrics collects wall time, database queries and peak resident memory
+growth per named stage, plus raster bytes read and peak resident memory over
+the whole run. Entering a stage more than once adds to its totals. Peak
+memory is the worker process's high-water mark (ru_maxrss), so a stage only
+shows growth when it pushes that mark higher; with a threaded worker the mark
+includes other runs.
+"""
+
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .raster import get_raster_reader
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class JobMetrics:
+    def __init__(self):
+        self.stages = {}
+        self.queries = 0
+        self.started = time.perf_counter()
+        self.peak_rss_start = peak_rss_bytes()
+        # Read counts are per thread, so other runs in the worker don't count
+        self.bytes_read_start = get_raster_reader().bytes_read
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage and count the queries it runs and the peak RSS it adds"""
+        queries = self.queries
+        peak_rss = peak_rss_bytes()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.count_query):
+                yield
+        finally:
+            stage = self.stages.setdefault(
+                name, {"seconds": 0.0, "queries": 0, "peak_rss_growth_bytes": 0}
+            )
+            stage["seconds"] = round(
+                stage["seconds"] + time.perf_counter() - started, 4
+            )
+            stage["queries"] += self.queries - queries
+            stage["peak_rss_growth_bytes"] += peak_rss_bytes() - peak_rss
+
+    def as_dict(self) -> dict:
+        peak_rss = peak_rss_bytes()
+        return {
+            "stages": self.stages,
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "queries": self.queries,
+            "bytes_read": get_raster_reader().bytes_read - self.bytes_read_start,
+            "peak_rss_bytes": peak_rss,
+            "peak_rss_growth_bytes": peak_rss - self.peak_rss_start,
+        }
@@ -0,0 +1,372 @@
+import fcntl
+import logging
+import math
+import os
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.gdal import GDALRaster
+
+logger = logging.getLogger(__name__)
+
+# Band name -> band index (1-based) in the multi-band scene GeoTIFFs
+DEFAULT_BAND_INDEXES = {"red": 1, "nir": 2, "swir": 3}
+
+# Keep GDAL's /vsicurl/ driver to ranged reads of the file itself, rather
+# than listing the remote directory or probing for sidecar files
+os.environ.setdefault("GDAL_DISABLE_READDIR_ON_OPEN", "EMPTY_DIR")
+os.environ.setdefault("CPL_VSIL_CURL_ALLOWED_EXTENSIONS", ".tif,.tiff")
+
+
+# GDAL datasets must not be read from two threads at once, so each thread
+# keeps its own handles
+_rasters = threading.local()
+
+
+def open_raster(source) -> GDALRaster:
+    """Open a GeoTIFF from a local path or URL, reading remote files lazily.
+
+    Open handles are cached per thread.
+    """
+    if isinstance(source, GDALRaster):
+        return source
+
+    cache = getattr(_rasters, "open", None)
+    if cache is None:
+        cache = _rasters.open = lru_cache(maxsize=32)(_open_raster)
+    return cache(source)
+
+
+def _open_raster(source: str) -> GDALRaster:
+    # Remote files are opened through /vsicurl/, which only fetches the
+    # header and the byte ranges of the blocks that are actually read
+    if source.startswith(("http://", "https://")):
+        source = f"/vsicurl/{source}"
+    elif source.startswith("file://"):
+        source = source[len("file://") :]
+
+    return GDALRaster(source)
+
+
+def get_pixel_window(raster: GDALRaster, bounds) -> Tuple[int, int, int, int]:
+    """Convert (xmin, ymin, xmax, ymax) bounds to a clipped pixel window.
+
+    Returns (col_off, row_off, width, height); width/height are 0 when the
+    bounds fall outside the raster.
+    """
+    origin_x, origin_y = raster.origin
+    scale_x, scale_y = raster.scale
+    xmin, ymin, xmax, ymax = bounds
+
+    cols = sorted(((xmin - origin_x) / scale_x, (xmax - origin_x) / scale_x))
+    rows = sorted(((ymin - origin_y) / scale_y, (ymax - origin_y) / scale_y))
+
+    col_off = max(int(math.floor(cols[0])), 0)
+    row_off = max(int(math.floor(rows[0])), 0)
+    col_end = min(int(math.ceil(cols[1])), raster.width)
+    row_end = min(int(math.ceil(rows[1])), raster.height)
+
+    return col_off, row_off, max(col_end - col_off, 0), max(row_end - row_off, 0)
+
+
+def window_geotransform(raster: GDALRaster, col_off: int, row_off: int) -> tuple:
+    """Geotransform (origin_x, scale_x, 0, origin_y, 0, scale_y) of a window"""
+    origin_x, origin_y = raster.origin
+    scale_x, scale_y = raster.scale
+    return (
+        origin_x + col_off * scale_x,
+        scale_x,
+        0.0,
+        origin_y + row_off * scale_y,
+        0.0,
+        scale_y,
+    )
+
+
+def read_window(
+    source, bounds, band_indexes: Dict[str, int] = None
+) -> Tuple[Dict[str, np.ndarray], tuple]:
+    """Read the pixel window covering bounds from each named band.
+
+    Bounds are in the raster's own CRS. Returns the band arrays as float32 and
+    the window's geotransform.
+    """
+    raster = open_raster(source)
+    band_indexes = band_indexes or DEFAULT_BAND_INDEXES
+    col_off, row_off, width, height = get_pixel_window(raster, bounds)
+
+    if not width or not height:
+        raise ValueError("Bounds do not intersect the raster")
+
+    arrays = {
+        name: np.asarray(
+            raster.bands[index - 1].data(
+                offset=(col_off, row_off), size=(width, height)
+            ),
+            dtype=np.float32,
+        ).reshape(height, width)
+        for name, index in band_indexes.items()
+    }
+    return arrays, window_geotransform(raster, col_off, row_off)
+
+
+class TileCache:
+    """Size-bounded on-disk LRU cache of raster blocks.
+
+    Blocks are stored as .npy files keyed by (scene_id, band, block_x,
+    block_y); file modification times track recency, so the cache can be
+    shared by every worker process on a host. The total size is kept in a
+    file in the cache directory, updated under a file lock, and one process
+    at a time evicts, recomputing the size from disk as it does.
+    """
+
+    SIZE_FILE = ".size"
+    EVICT_LOCK_FILE = ".evict.lock"
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+
+    def _path(self, key) -> str:
+        scene_id, band, block_x, block_y = key
+        scene_dir = re.sub(r"[^A-Za-z0-9._-]", "_", scene_id)
+        return os.path.join(
+            self.directory, scene_dir, str(band), f"{block_y}_{block_x}.npy"
+        )
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".npy"):
+                    yield os.path.join(root, name)
+
+    @contextmanager
+    def _size_file(self):
+        """Open the shared size file, holding its lock"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(
+            os.path.join(self.directory, self.SIZE_FILE), os.O_RDWR | os.O_CREAT
+        )
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield fd
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _read_size(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            return int(os.read(fd, 32))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _write_size(fd, size: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(size).encode())
+
+    def _add_size(self, delta: int) -> int:
+        """Add delta to the shared size, returning the new total"""
+        with self._size_file() as fd:
+            size = self._read_size(fd)
+            if size is None:
+                # First use of the directory, which already holds the block
+                size = sum(_file_size(path) for path in self._files())
+            else:
+                size = max(size + delta, 0)
+            self._write_size(fd, size)
+        return size
+
+    def get(self, key):
+        """Return a cached block, or None"""
+        path = self._path(key)
+        try:
+            block = np.load(path)
+            os.utime(path)
+            return block
+        except (FileNotFoundError, ValueError, EOFError):
+            return None
+
+    def put(self, key, block: np.ndarray) -> None:
+        """Store a block, evicting least recently used blocks when over size"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous_size = _file_size(path)
+
+        # Write then rename so concurrent readers never see partial files
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, block)
+        os.replace(tmp_path, path)
+
+        if self._add_size(_file_size(path) - previous_size) > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used blocks until under 90% of max size.
+
+        Only one process evicts at a time; others skip eviction while it
+        runs rather than walking the directory too.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock_fd = os.open(
+            os.path.join(self.directory, self.EVICT_LOCK_FILE), os.O_RDWR | os.O_CREAT
+        )
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+
+            files = []
+            for path in self._files():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            files.sort()
+            size = sum(file_size for _, file_size, _ in files)
+            target = self.max_bytes * 0.9
+
+            for _, file_size, path in files:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+
+            # Reset the shared size to what is on disk, correcting any drift
+            with self._size_file() as fd:
+                self._write_size(fd, size)
+        finally:
+            os.close(lock_fd)
+
+
+def _file_size(path) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+class _ReadCounters(threading.local):
+    """Read counts of a raster reader, kept separately for each thread"""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class WindowedRasterReader:
+    """Read AOI windows from cloud-optimized GeoTIFFs block by block.
+
+    Windows are expanded to a fixed block grid; each block is read once via
+    a ranged GDAL read and kept in the tile cache, so AOIs overlapping on the
+    same scene reuse each other's blocks.
+    """
+
+    def __init__(self, cache: TileCache = None, block_size: int = 512):
+        self.cache = cache
+        self.block_size = block_size
+        self.counters = _ReadCounters()
+
+    @property
+    def bytes_read(self) -> int:
+        """Bytes read from rasters by the current thread"""
+        return self.counters.bytes_read
+
+    @property
+    def cache_hits(self) -> int:
+        return self.counters.cache_hits
+
+    @property
+    def cache_misses(self) -> int:
+        return self.counters.cache_misses
+
+    def read_block(self, scene_id, raster: GDALRaster, band: int, block_x, block_y):
+        """Read one block of a band, from the cache when possible"""
+        key = (scene_id, band, block_x, block_y)
+        if self.cache:
+            block = self.cache.get(key)
+            if block is not None:
+                self.counters.cache_hits += 1
+                return block
+
+        col_off = block_x * self.block_size
+        row_off = block_y * self.block_size
+        width = min(self.block_size, raster.width - col_off)
+        height = min(self.block_size, raster.height - row_off)
+
+        block = np.asarray(
+            raster.bands[band - 1].data(offset=(col_off, row_off), size=(width, height))
+        ).reshape(height, width)
+
+        self.counters.cache_misses += 1
+        self.counters.bytes_read += block.nbytes
+        if self.cache:
+            self.cache.put(key, block)
+        return block
+
+    def read_window(
+        self, scene_id, source, bounds, band_indexes: Dict[str, int] = None
+    ) -> Tuple[Dict[str, np.ndarray], tuple]:
+        """Read the pixel window covering bounds from each named band.
+
+        Same contract as read_window(), with blocks served through the cache.
+        """
+        raster = open_raster(source)
+        band_indexes = band_indexes or DEFAULT_BAND_INDEXES
+        col_off, row_off, width, height = get_pixel_window(raster, bounds)
+
+        if not width or not height:
+            raise ValueError("Bounds do not intersect the raster")
+
+        size = self.block_size
+        block_cols = range(col_off // size, (col_off + width - 1) // size + 1)
+        block_rows = range(row_off // size, (row_off + height - 1) // size + 1)
+
+        arrays = {}
+        for name, band in band_indexes.items():
+            window = np.empty((height, width), dtype=np.float32)
+
+            for block_y in block_rows:
+                for block_x in block_cols:
+                    block = self.read_block(scene_id, raster, band, block_x, block_y)
+
+                    # Overlap of this block with the window, in raster pixels
+                    x0 = max(col_off, block_x * size)
+                    y0 = max(row_off, block_y * size)
+                    x1 = min(col_off + width, block_x * size + block.shape[1])
+                    y1 = min(row_off + height, block_y * size + block.shape[0])
+
+                    window[y0 - row_off : y1 - row_off, x0 - col_off : x1 - col_off] = (
+                        block[
+                            y0 - block_y * size : y1 - block_y * size,
+                            x0 - block_x * size : x1 - block_x * size,
+                        ]
+                    )
+
+            arrays[name] = window
+
+        return arrays, window_geotransform(raster, col_off, row_off)
+
+
+@lru_cache(maxsize=1)
+def get_raster_reader() -> WindowedRasterReader:
+    """Worker-local raster reader backed by the shared on-disk tile cache"""
+    cache = None
+    if settings.RASTER_CACHE_MAX_BYTES > 0:
+        cache = TileCache(settings.RASTER_CACHE_DIR, settings.RASTER_CACHE_MAX_BYTES)
+    return WindowedRasterReader(cache, block_size=settings.RASTER_BLOCK_SIZE)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
+from asset_watch.geojson import DatabaseGeoJSONMixin
 from .models import MonitoringJob, SatelliteImage
 
 
@@ -18,10 +19,11 @@ class MonitoringJobSerializer(serializers.ModelSerializer):
             "error_message",
             "images_processed",
             "encroachments_detected",
+            "stage_metrics",
         ]
 
 
-class SatelliteImageSerializer(GeoFeatureModelSerializer):
+class SatelliteImageSerializer(DatabaseGeoJSONMixin, GeoFeatureModelSerializer):
     class Meta:
         model = SatelliteImage
         geo_field = "geometry"
@@ -1,30 +1,220 @@
+import asyncio
 import requests
+import aiohttp
 import numpy as np
-from django.contrib.gis.geos import Polygon, Point
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import GeometryCollection, MultiPolygon, Polygon, Point
 from django.contrib.gis.measure import D
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import logging
+import random
+import time
+import uuid
 
 from aoi.models import Aoi, EncroachmentDetection
-from .models import SatelliteImage
+from .catalog import get_catalogs, item_datetime, item_to_scene
+from .detection import (
+    detect_changes_batch,
+    pixel_area_m2,
+    pixel_centers,
+    stack_crops,
+    summarize_changes,
+)
+from .geometry_cache import get_aoi_geometry_cache
+from .models import CatalogCursor, MonitoringJob, ProcessedScene, SatelliteImage
+from .pool import reset_detection_pool, submit_detection
+from .profiling import JobMetrics
+from .raster import (
+    get_pixel_window,
+    get_raster_reader,
+    open_raster,
+    window_geotransform,
+)
 
 logger = logging.getLogger(__name__)
 
+# Time between monitoring runs, per monitoring type
+MONITORING_INTERVALS = {
+    "daily": timedelta(days=1),
+    "monthly": timedelta(days=30),
+    "yearly": timedelta(days=365),
+}
+
+# Celery task priority of scheduled runs per monitoring type (0 is highest)
+MONITORING_PRIORITIES = {
+    "daily": 2,
+    "monthly": 5,
+    "yearly": 8,
+}
+
+# Minimum changed area in square metres for each severity level
+SEVERITY_AREA_THRESHOLDS = [
+    (10_000, "critical"),
+    (2_000, "high"),
+    (500, "medium"),
+]
+
+# Kind of change scored by each spectral index
+CHANGE_TYPES = {
+    "ndvi": "vegetation loss",
+    "ndbi": "construction",
+    "combined": "land use change",
+}
+
+
+class MonitoringSchedulerService:
+    """Service for selecting AOIs that are due for monitoring"""
+
+    @staticmethod
+    def get_active_aois(now=None):
+        """Get AOIs that are paid, active and within their monitoring period"""
+        now = now or timezone.now()
+        return Aoi.objects.filter(status="active", is_paid=True, end_date__gt=now)
+
+    @staticmethod
+    def get_due_aois(now=None):
+        """Get active AOIs whose next monitoring run is due"""
+        now = now or timezone.now()
+        return MonitoringSchedulerService.get_active_aois(now).filter(
+            next_run_at__lte=now
+        )
+
+    @staticmethod
+    def get_next_run_at(monitoring_type: str, now=None):
+        """Next run time for a monitoring type, jittered to spread load"""
+        now = now or timezone.now()
+        interval = MONITORING_INTERVALS[monitoring_type]
+        jitter = interval * settings.MONITORING_SCHEDULE_JITTER
+        return now + interval + jitter * random.uniform(-1, 1)
+
+    @staticmethod
+    def claim_due_aois(now=None, limit=500) -> List[Aoi]:
+        """Claim up to limit due AOIs.
+
+        Due rows are locked with FOR UPDATE SKIP LOCKED, so concurrent
+        schedulers claim disjoint sets, and their next_run_at is moved on
+        before the transaction commits. Callers that fail to queue the runs
+        hand the AOIs back with release_aois.
+        """
+        now = now or timezone.now()
+
+        with transaction.atomic():
+            aois = list(
+                MonitoringSchedulerService.get_due_aois(now)
+                .filter(monitoring_type__in=list(MONITORING_INTERVALS))
+                .order_by("next_run_at")
+                .select_for_update(skip_locked=True, of=("self",))
+                .only("id", "monitoring_type", "next_run_at")[:limit]
+            )
+
+            for aoi in aois:
+                aoi.next_run_at = MonitoringSchedulerService.get_next_run_at(
+                    aoi.monitoring_type, now
+                )
+            Aoi.objects.bulk_update(aois, ["next_run_at"])
+
+        return aois
+
+    @staticmethod
+    def release_aois(aoi_ids, now=None) -> None:
+        """Make claimed AOIs due again, for runs that could not be queued"""
+        now = now or timezone.now()
+        Aoi.objects.filter(id__in=aoi_ids).update(next_run_at=now)
+
+    @staticmethod
+    def fail_jobs(job_ids, error_message: str, now=None) -> int:
+        """Fail jobs that are still open"""
+        now = now or timezone.now()
+        return MonitoringJob.objects.filter(
+            id__in=job_ids, status__in=["pending", "running"]
+        ).update(status="failed", error_message=error_message, completed_at=now)
+
+    @staticmethod
+    def create_jobs(
+        aoi_ids, status: str = "pending", celery_task_id: str = None
+    ) -> Dict[str, MonitoringJob]:
+        """Create jobs for AOIs that have no open job.
+
+        The unique constraint on open jobs rejects duplicates in the database,
+        so concurrent schedulers, manual triggers and scene runs cannot work
+        on the same AOI at once. Each job gets the id of the Celery task to
+        run it, a new one unless celery_task_id is given. Returns the created
+        jobs keyed by AOI id.
+        """
+        jobs = [
+            MonitoringJob(
+                aoi_id=aoi_id,
+                status=status,
+                celery_task_id=celery_task_id or str(uuid.uuid4()),
+            )
+            for aoi_id in aoi_ids
+        ]
+        MonitoringJob.objects.bulk_create(jobs, ignore_conflicts=True)
+
+        created = MonitoringJob.objects.filter(id__in=[job.id for job in jobs])
+        return {str(job.aoi_id): job for job in created}
+
+    @staticmethod
+    def start_job(job_id) -> bool:
+        """Move a pending job to running, returning False if it is not pending"""
+        return bool(
+            MonitoringJob.objects.filter(id=job_id, status="pending").update(
+                status="running", started_at=timezone.now()
+            )
+        )
+
+    @staticmethod
+    def reap_stale_jobs(now=None) -> int:
+        """Fail open jobs that were never picked up or never finished"""
+        now = now or timezone.now()
+        return MonitoringJob.objects.filter(
+            Q(
+                status="pending",
+                started_at__lt=now - settings.MONITORING_JOB_PENDING_TIMEOUT,
+            )
+            | Q(
+                status="running",
+                started_at__lt=now - settings.MONITORING_JOB_RUNNING_TIMEOUT,
+            )
+        ).update(
+            status="failed",
+            completed_at=now,
+            error_message="Job timed out before completing",
+        )
+
 
 class SatelliteImageService:
     """Service for managing satellite imagery"""
 
     @staticmethod
     def get_images_for_aoi(
-        aoi: Aoi, start_date=None, end_date=None
+        aoi: Aoi, start_date=None, end_date=None, reprocess=False
     ) -> List[SatelliteImage]:
-        """Get satellite images that cover an AOI within date range"""
+        """Get satellite images that cover an AOI within date range.
+
+        Images already recorded as processed for the AOI are skipped unless
+        reprocess is set.
+        """
         queryset = SatelliteImage.objects.filter(
             geometry__intersects=aoi.geometry
         ).order_by("-acquisition_date")
 
+        if not reprocess:
+            queryset = queryset.filter(
+                ~Exists(
+                    ProcessedScene.objects.filter(
+                        aoi=aoi, satellite_image=OuterRef("pk")
+                    )
+                )
+            )
+
         if start_date:
             queryset = queryset.filter(acquisition_date__gte=start_date)
 
@@ -37,120 +227,741 @@ class SatelliteImageService:
         return list(queryset[:10])  # Limit to 10 most recent images
 
     @staticmethod
-    def fetch_latest_images() -> int:
-        """Simulate fetching latest satellite images"""
-        # In a real implementation, this would:
-        # 1. Connect to satellite data APIs
-        # 2. Query for new images
-        # 3. Download metadata and thumbnails
-        # 4. Store in database
+    def get_reference_image(aoi: Aoi, satellite_image: SatelliteImage):
+        """Get the latest clear image of the AOI taken before the given image"""
+        return (
+            SatelliteImage.objects.filter(
+                geometry__intersects=aoi.geometry,
+                satellite=satellite_image.satellite,
+                acquisition_date__lt=satellite_image.acquisition_date,
+                cloud_coverage__lt=20.0,
+            )
+            .order_by("-acquisition_date")
+            .first()
+        )
 
-        # For demo, we'll create some sample data
-        sample_images = [
-            {
-                "scene_id": f'S2A_MSIL1C_{timezone.now().strftime("%Y%m%dT%H%M%S")}',
-                "satellite": "Sentinel-2",
-                "acquisition_date": timezone.now() - timedelta(hours=6),
-                "cloud_coverage": 5.2,
-                "geometry": Polygon.from_bbox((3.0, 6.0, 4.0, 7.0)),  # Lagos area
-                "image_url": "https://example.com/satellite/image1.tif",
-                "thumbnail_url": "https://example.com/satellite/thumb1.jpg",
-            }
+    @staticmethod
+    def get_reference_candidates(satellite_image: SatelliteImage, limit=10):
+        """Get the latest clear images overlapping a scene taken before it"""
+        return list(
+            SatelliteImage.objects.filter(
+                geometry__intersects=satellite_image.geometry,
+                satellite=satellite_image.satellite,
+                acquisition_date__lt=satellite_image.acquisition_date,
+                cloud_coverage__lt=20.0,
+            ).order_by("-acquisition_date")[:limit]
+        )
+
+    @staticmethod
+    def mark_images_processed(aoi: Aoi, images) -> None:
+        """Record images as processed for an AOI"""
+        ProcessedScene.objects.bulk_create(
+            [ProcessedScene(aoi=aoi, satellite_image=image) for image in images],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def mark_scene_processed(satellite_image: SatelliteImage, aois) -> None:
+        """Record a scene as processed for each of the given AOIs"""
+        ProcessedScene.objects.bulk_create(
+            [ProcessedScene(aoi=aoi, satellite_image=satellite_image) for aoi in aois],
+            ignore_conflicts=True,
+        )
+
+    @staticmethod
+    def fetch_latest_images() -> List[str]:
+        """Ingest new scenes from all satellite providers, returning new image ids"""
+        return async_to_sync(SatelliteImageService.ingest_catalogs)(get_catalogs())
+
+    @staticmethod
+    async def ingest_catalogs(catalogs) -> List[str]:
+        """Stream pages from all catalogs concurrently into bulk upserts.
+
+        Each catalog's pages are fetched in order, with requests to a provider
+        bounded by its concurrency. Pages are merged from a queue and written
+        by a single consumer, one upsert per catalog for each batch of queued
+        pages, with the catalog's cursor saved in the same transaction. A
+        catalog that fails stops at its last saved page and resumes from it on
+        the next run, without holding up the others.
+        """
+        cursors = await sync_to_async(SatelliteImageService.get_catalog_cursors)(
+            [catalog.name for catalog in catalogs]
+        )
+        limits = {}
+        for catalog in catalogs:
+            limits.setdefault(catalog.provider, asyncio.Semaphore(catalog.concurrency))
+
+        queue = asyncio.Queue(maxsize=2 * len(catalogs))
+        failed = set()
+        created_ids = []
+
+        async def produce(catalog, session):
+            cursor = cursors[catalog.name]
+            try:
+                async for page in catalog.pages(
+                    session,
+                    limits[catalog.provider],
+                    since=cursor.last_acquired_at,
+                    next_page=cursor.next_page,
+                ):
+                    if catalog.name in failed:
+                        break
+                    await queue.put((cursor, page))
+            except Exception as e:
+                logger.error(f"Error fetching scenes from {catalog.name}: {e}")
+
+        async def consume():
+            save_pages = sync_to_async(SatelliteImageService.save_catalog_pages)
+            while True:
+                queued = [await queue.get()]
+                while not queue.empty():
+                    queued.append(queue.get_nowait())
+
+                # Pages queued after their catalog failed are dropped
+                batches = {}
+                for cursor, page in queued:
+                    if cursor.catalog not in failed:
+                        batches.setdefault(cursor.catalog, []).append((cursor, page))
+
+                try:
+                    for name, batch in batches.items():
+                        try:
+                            created_ids.extend(await save_pages(batch))
+                        except Exception as e:
+                            failed.add(name)
+                            logger.error(f"Error saving pages from {name}: {e}")
+                finally:
+                    # Every dequeued page is done, saved or dropped, or
+                    # queue.join() below never returns
+                    for _ in queued:
+                        queue.task_done()
+
+        async with aiohttp.ClientSession() as session:
+            consumer = asyncio.create_task(consume())
+            await asyncio.gather(*(produce(catalog, session) for catalog in catalogs))
+            await queue.join()
+            consumer.cancel()
+
+        return created_ids
+
+    @staticmethod
+    def get_catalog_cursors(names) -> Dict[str, CatalogCursor]:
+        """Ingestion cursors by catalog name, creating missing ones"""
+        CatalogCursor.objects.bulk_create(
+            [CatalogCursor(catalog=name) for name in names], ignore_conflicts=True
+        )
+        return {
+            cursor.catalog: cursor
+            for cursor in CatalogCursor.objects.filter(catalog__in=names)
+        }
+
+    @staticmethod
+    def save_catalog_pages(batch) -> List[str]:
+        """Upsert the scenes of several catalog pages and advance their cursors"""
+        scenes = [
+            scene
+            for _, page in batch
+            for scene in map(item_to_scene, page.items)
+            if scene
         ]
 
-        created_count = 0
-        for img_data in sample_images:
-            image, created = SatelliteImage.objects.get_or_create(
-                scene_id=img_data["scene_id"], defaults=img_data
+        with transaction.atomic():
+            created_ids = SatelliteImageService.upsert_scenes(scenes)
+
+            for cursor, page in batch:
+                cursor.next_page = page.next_page
+                cursor.updated_at = timezone.now()
+                for item in page.items:
+                    acquired_at = item_datetime(item)
+                    if (
+                        not cursor.last_acquired_at
+                        or acquired_at > cursor.last_acquired_at
+                    ):
+                        cursor.last_acquired_at = acquired_at
+
+            cursors = {cursor.catalog: cursor for cursor, _ in batch}.values()
+            CatalogCursor.objects.bulk_update(
+                cursors, ["next_page", "last_acquired_at", "updated_at"]
             )
-            if created:
-                created_count += 1
 
-        return created_count
+        return created_ids
+
+    @staticmethod
+    def upsert_scenes(scenes: List[dict]) -> List[str]:
+        """Insert or update scenes by scene_id, returning ids of new images"""
+        scenes = list({scene["scene_id"]: scene for scene in scenes}.values())
+        if not scenes:
+            return []
+
+        now = timezone.now()
+        rows = []
+        params = []
+        for scene in scenes:
+            rows.append("(%s, %s, %s, %s, %s, %s::geometry, %s, %s, %s)")
+            params += [
+                str(uuid.uuid4()),
+                scene["scene_id"],
+                scene["satellite"],
+                scene["acquisition_date"],
+                scene["cloud_coverage"],
+                scene["geometry"].hexewkb.decode(),
+                scene["image_url"],
+                scene["thumbnail_url"],
+                now,
+            ]
+
+        columns = (
+            "satellite, acquisition_date, cloud_coverage, geometry, "
+            "image_url, thumbnail_url"
+        )
+        excluded = ", ".join(
+            f"EXCLUDED.{column.strip()}" for column in columns.split(",")
+        )
+        sql = f"""
+            INSERT INTO satellite_image (
+                id, scene_id, {columns}, created_at
+            )
+            VALUES {", ".join(rows)}
+            ON CONFLICT (scene_id) DO UPDATE SET ({columns}) = ({excluded})
+            WHERE (satellite_image.{columns.replace(", ", ", satellite_image.")})
+                IS DISTINCT FROM ({excluded})
+            RETURNING id, (xmax = 0) AS inserted
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [str(row[0]) for row in cursor.fetchall() if row[1]]
+
+    @staticmethod
+    def match_images_to_aois(image_ids) -> Dict[str, List[str]]:
+        """Match scene footprints to all intersecting active AOIs in one query.
+
+        Returns a mapping of satellite image id to the ids of the active, paid
+        AOIs its footprint intersects. Scenes covering no AOI are omitted.
+        """
+        intersecting_aois = (
+            MonitoringSchedulerService.get_active_aois()
+            .filter(geometry__intersects=OuterRef("geometry"))
+            .order_by()
+            .values("id")
+        )
+        matches = (
+            SatelliteImage.objects.filter(id__in=image_ids)
+            .annotate(aoi_ids=ArraySubquery(intersecting_aois))
+            .order_by()
+            .values_list("id", "aoi_ids")
+        )
+
+        return {
+            str(image_id): [str(aoi_id) for aoi_id in aoi_ids]
+            for image_id, aoi_ids in matches
+            if aoi_ids
+        }
 
 
 class EncroachmentDetectionService:
     """Service for detecting encroachments using AI/ML"""
 
     @staticmethod
-    def detect_encroachment(
-        aoi: Aoi, satellite_image: SatelliteImage
+    def get_severity(area_m2: float) -> str:
+        """Map the size of a changed region to a severity level"""
+        for min_area, severity in SEVERITY_AREA_THRESHOLDS:
+            if area_m2 >= min_area:
+                return severity
+        return "low"
+
+    @staticmethod
+    def polygonal_area(geometry):
+        """Reduce a clipped region to a single Polygon.
+
+        Clipping can leave lines or points where a region only touches the
+        AOI boundary; those are dropped, and several polygonal pieces are
+        merged into their convex hull. Returns None when nothing with an area
+        is left.
+        """
+        if isinstance(geometry, Polygon):
+            parts = [geometry]
+        elif isinstance(geometry, GeometryCollection):
+            parts = [part for part in geometry if isinstance(part, Polygon)]
+        else:
+            parts = []
+
+        parts = [part for part in parts if not part.empty and part.area > 0]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return MultiPolygon(parts, srid=geometry.srid).convex_hull
+
+    @staticmethod
+    def build_encroachments(
+        aoi: Aoi,
+        satellite_image: SatelliteImage,
+        reference_image: SatelliteImage,
+        regions: List[dict],
+        change_type: str,
     ) -> List[EncroachmentDetection]:
-        """Detect encroachments in AOI using satellite imagery"""
-        try:
-            # In a real implementation, this would:
-            # 1. Download the satellite image
-            # 2. Crop to AOI bounds
-            # 3. Run AI model for change detection
-            # 4. Analyze results for encroachments
-
-            # For demo purposes, we'll simulate detection
-            encroachments = []
-
-            # Simulate random encroachment detection (10% chance)
-            if np.random.random() < 0.1:
-                # Create a simulated encroachment within the AOI
-                aoi_bounds = aoi.geometry.extent  # (xmin, ymin, xmax, ymax)
-
-                # Create a small polygon within the AOI bounds
-                center_x = (aoi_bounds[0] + aoi_bounds[2]) / 2
-                center_y = (aoi_bounds[1] + aoi_bounds[3]) / 2
-
-                # Create a small rectangle around the center
-                offset = 0.001  # Small offset for demo
-                affected_area = Polygon.from_bbox(
-                    (
-                        center_x - offset,
-                        center_y - offset,
-                        center_x + offset,
-                        center_y + offset,
+        """Build unsaved encroachment detections from changed regions of an AOI"""
+        aoi_geometry = get_aoi_geometry_cache().geometry(aoi)
+        encroachments = []
+
+        for region in regions:
+            affected_area = region["polygon"].transform(
+                aoi_geometry.geometry.srid, clone=True
+            )
+            # Regions are mostly inside the AOI, so only clip those that cross it
+            if not aoi_geometry.prepared.contains(affected_area):
+                affected_area = affected_area.intersection(aoi_geometry.geometry)
+            affected_area = EncroachmentDetectionService.polygonal_area(affected_area)
+            if affected_area is None:
+                continue
+
+            severity = EncroachmentDetectionService.get_severity(region["area_m2"])
+            confidence_score = region["confidence"]
+
+            encroachment = EncroachmentDetection(
+                aoi=aoi,
+                severity=severity,
+                affected_area=affected_area,
+                confidence_score=confidence_score,
+                description=f"Potential {severity} encroachment detected through satellite analysis. "
+                f"{change_type.capitalize()} of {region['area_m2']:.0f} m² "
+                f"detected since {reference_image.acquisition_date:%Y-%m-%d}.",
+                satellite_image_url=satellite_image.image_url,
+            )
+
+            encroachments.append(encroachment)
+
+            logger.info(
+                f"Detected {severity} encroachment in AOI {aoi.name} "
+                f"with confidence {confidence_score:.2f}"
+            )
+
+        return encroachments
+
+    @staticmethod
+    def get_detection_options() -> dict:
+        """Change detection options from settings"""
+        return {
+            "index": settings.MONITORING_CHANGE_INDEX,
+            "threshold": settings.MONITORING_CHANGE_THRESHOLD,
+            "min_pixels": settings.MONITORING_MIN_CHANGE_PIXELS,
+        }
+
+    @staticmethod
+    def prepare_analysis(
+        satellite_image: SatelliteImage,
+        aoi: Aoi,
+        reference_image: SatelliteImage,
+    ) -> dict:
+        """Read the AOI's window from both images and rasterize the AOI mask.
+
+        The AOI's transformed geometry and its mask on the image's pixel grid
+        come from the worker's AOI geometry cache.
+        """
+        reader = get_raster_reader()
+        geometry_cache = get_aoi_geometry_cache()
+        raster = open_raster(satellite_image.image_url)
+        srid = raster.srid or aoi.geometry.srid
+        extent = geometry_cache.geometry(aoi, srid).extent
+
+        after, geotransform = reader.read_window(
+            satellite_image.scene_id, raster, extent
+        )
+        before, _ = reader.read_window(
+            reference_image.scene_id, reference_image.image_url, extent
+        )
+
+        shape = after["red"].shape
+        if before["red"].shape != shape:
+            raise ValueError("Reference image is not co-registered with image")
+
+        return {
+            "before": before,
+            "after": after,
+            "mask": geometry_cache.mask(aoi, srid, geotransform, shape),
+            "geotransform": geotransform,
+            "srid": srid,
+        }
+
+    @staticmethod
+    def summarize_analysis(prepared: dict, regions: List[dict]) -> dict:
+        """Summarize detected regions relative to the analysed AOI area"""
+        mask = prepared["mask"]
+        geotransform = prepared["geotransform"]
+        _, ys = pixel_centers(geotransform, mask.shape)
+        mask_area_m2 = float(
+            (mask.sum(axis=1) * pixel_area_m2(geotransform, prepared["srid"], ys)).sum()
+        )
+
+        return {
+            **summarize_changes(regions, mask_area_m2),
+            "change_type": CHANGE_TYPES[settings.MONITORING_CHANGE_INDEX],
+            "regions": regions,
+        }
+
+    @staticmethod
+    def detect_encroachment_images(
+        aoi: Aoi, images: List[SatelliteImage], metrics: JobMetrics = None
+    ) -> Dict[str, List[EncroachmentDetection]]:
+        """Detect encroachments in an AOI across several images in parallel.
+
+        Windows are read here and detection for each image is submitted to the
+        worker's process pool as soon as its arrays are ready; results are
+        collected here as they come back. Returns detections keyed by image
+        id for every image that was analysed; images that failed are left
+        out, so callers must not record them as processed and they are
+        retried on the next run. Reference lookup, raster reads and waiting
+        on detection are timed as stages of metrics, if given.
+        """
+        options = EncroachmentDetectionService.get_detection_options()
+        change_type = CHANGE_TYPES[settings.MONITORING_CHANGE_INDEX]
+        metrics = metrics or JobMetrics()
+        results = {}
+        pending = []
+
+        for image in images:
+            try:
+                with metrics.stage("scene_lookup"):
+                    reference_image = SatelliteImageService.get_reference_image(
+                        aoi, image
+                    )
+                if not reference_image:
+                    results[str(image.id)] = []
+                    continue
+
+                with metrics.stage("raster_read"):
+                    prepared = EncroachmentDetectionService.prepare_analysis(
+                        image, aoi, reference_image
+                    )
+                future = submit_detection(prepared, options)
+                pending.append((image, reference_image, future))
+            except Exception as e:
+                logger.error(f"Error preparing image {image.scene_id}: {e}")
+
+        for image, reference_image, future in pending:
+            try:
+                with metrics.stage("detection"):
+                    regions = future.result()
+                results[str(image.id)] = (
+                    EncroachmentDetectionService.build_encroachments(
+                        aoi, image, reference_image, regions, change_type
                     )
                 )
+            except BrokenProcessPool as e:
+                logger.error(f"Detection pool failed on image {image.scene_id}: {e}")
+                reset_detection_pool()
+            except Exception as e:
+                logger.error(f"Error processing image {image.scene_id}: {e}")
+
+        return results
 
-                # Determine severity based on simulated analysis
-                severities = ["low", "medium", "high", "critical"]
-                severity = np.random.choice(severities, p=[0.4, 0.3, 0.2, 0.1])
+    @staticmethod
+    def detect_encroachment_batch(
+        aois: List[Aoi], satellite_image: SatelliteImage
+    ) -> Dict[str, List[EncroachmentDetection]]:
+        """Detect encroachments for many AOIs covered by one scene.
 
-                confidence_score = np.random.uniform(0.7, 0.95)
+        AOIs are grouped by reference image and into spatially compact
+        batches. Each batch reads its union window once per image, and the
+        padded per-AOI crops are analysed together in a single pass. Returns
+        unsaved detections keyed by AOI id for every AOI that was analysed;
+        AOIs in a failed batch are left out, so callers must not record the
+        scene as processed for them and each AOI's next run retries it.
+        """
+        raster = open_raster(satellite_image.image_url)
+        srid = raster.srid or satellite_image.geometry.srid
+        reference_images = SatelliteImageService.get_reference_candidates(
+            satellite_image
+        )
 
-                encroachment = EncroachmentDetection.objects.create(
-                    aoi=aoi,
-                    severity=severity,
-                    affected_area=affected_area,
-                    confidence_score=confidence_score,
-                    description=f"Potential {severity} encroachment detected through satellite analysis. "
-                    f"Change detected in vegetation/land use pattern.",
-                    satellite_image_url=satellite_image.image_url,
-                )
+        geometry_cache = get_aoi_geometry_cache()
+        results = {}
+        groups = {}
 
-                encroachments.append(encroachment)
+        for aoi in aois:
+            reference_image = next(
+                (
+                    reference
+                    for reference in reference_images
+                    if geometry_cache.intersects(aoi, reference.geometry)
+                ),
+                None,
+            )
+            if not reference_image:
+                results[str(aoi.id)] = []
+                continue
+
+            extent = geometry_cache.geometry(aoi, srid).extent
+            window = get_pixel_window(raster, extent)
+            if not window[2] or not window[3]:
+                results[str(aoi.id)] = []
+                continue
+
+            groups.setdefault(reference_image, []).append((aoi, extent, window))
+
+        for reference_image, members in groups.items():
+            for batch in EncroachmentDetectionService.plan_batches(members):
+                try:
+                    results.update(
+                        EncroachmentDetectionService.analyze_batch(
+                            satellite_image, reference_image, raster, srid, batch
+                        )
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"Error analysing batch of {len(batch)} AOIs for "
+                        f"{satellite_image.scene_id}: {e}"
+                    )
 
+        return results
+
+    @staticmethod
+    def plan_batches(members) -> List[list]:
+        """Split (aoi, extent, window) members into spatially compact batches.
+
+        Members are ordered by window position and added to the current batch
+        while both its union window and its padded stack stay within
+        MONITORING_BATCH_MAX_PIXELS.
+        """
+        max_pixels = settings.MONITORING_BATCH_MAX_PIXELS
+        members = sorted(members, key=lambda member: (member[2][1], member[2][0]))
+
+        batches = []
+        batch = []
+        for member in members:
+            candidate = batch + [member]
+            windows = [window for _, _, window in candidate]
+            union_width = max(w[0] + w[2] for w in windows) - min(w[0] for w in windows)
+            union_height = max(w[1] + w[3] for w in windows) - min(
+                w[1] for w in windows
+            )
+            stack_pixels = (
+                len(windows) * max(w[2] for w in windows) * max(w[3] for w in windows)
+            )
+
+            if batch and max(union_width * union_height, stack_pixels) > max_pixels:
+                batches.append(batch)
+                batch = [member]
+            else:
+                batch = candidate
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def analyze_batch(
+        satellite_image: SatelliteImage,
+        reference_image: SatelliteImage,
+        raster,
+        srid: int,
+        batch: list,
+    ) -> Dict[str, List[EncroachmentDetection]]:
+        """Read a batch's union window once per image and analyse all its AOIs"""
+        reader = get_raster_reader()
+        geometry_cache = get_aoi_geometry_cache()
+        union_bounds = (
+            min(extent[0] for _, extent, _ in batch),
+            min(extent[1] for _, extent, _ in batch),
+            max(extent[2] for _, extent, _ in batch),
+            max(extent[3] for _, extent, _ in batch),
+        )
+
+        after, union_transform = reader.read_window(
+            satellite_image.scene_id, raster, union_bounds
+        )
+        before, reference_transform = reader.read_window(
+            reference_image.scene_id, reference_image.image_url, union_bounds
+        )
+        if (
+            reference_transform != union_transform
+            or before["red"].shape != after["red"].shape
+        ):
+            raise ValueError("Reference image is not co-registered with image")
+
+        union_col, union_row = get_pixel_window(raster, union_bounds)[:2]
+        crops = []
+        geotransforms = []
+        masks = []
+
+        for aoi, _, (col_off, row_off, width, height) in batch:
+            rows = slice(row_off - union_row, row_off - union_row + height)
+            cols = slice(col_off - union_col, col_off - union_col + width)
+            geotransform = window_geotransform(raster, col_off, row_off)
+
+            crops.append((rows, cols))
+            geotransforms.append(geotransform)
+            masks.append(geometry_cache.mask(aoi, srid, geotransform, (height, width)))
+
+        regions = detect_changes_batch(
+            {
+                name: stack_crops([band[rows, cols] for rows, cols in crops])
+                for name, band in before.items()
+            },
+            {
+                name: stack_crops([band[rows, cols] for rows, cols in crops])
+                for name, band in after.items()
+            },
+            geotransforms,
+            stack_crops(masks, fill=False),
+            srid=srid,
+            **EncroachmentDetectionService.get_detection_options(),
+        )
+
+        change_type = CHANGE_TYPES[settings.MONITORING_CHANGE_INDEX]
+        return {
+            str(aoi.id): EncroachmentDetectionService.build_encroachments(
+                aoi, satellite_image, reference_image, aoi_regions, change_type
+            )
+            for (aoi, _, _), aoi_regions in zip(batch, regions)
+        }
+
+
+class RetentionService:
+    """Service for deleting expired rows without long-running locks"""
+
+    @staticmethod
+    def delete_older_than(model, field: str, cutoff, batch_size: int = None) -> int:
+        """Delete rows of model whose field is before cutoff, in batches.
+
+        Each batch is a raw DELETE of up to batch_size rows in primary key
+        order, committed on its own, so locks are short and no objects are
+        loaded. Only use for tables that no other table references with a
+        cascading foreign key. A killed run loses at most one uncommitted
+        batch, and the next run carries on with the remaining rows.
+        """
+        batch_size = batch_size or settings.RETENTION_DELETE_BATCH_SIZE
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        column = connection.ops.quote_name(model._meta.get_field(field).column)
+
+        sql = f"""
+            WITH batch AS (
+                SELECT {pk} FROM {table}
+                WHERE {column} < %s AND {pk} > %s
+                ORDER BY {pk}
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            DELETE FROM {table} USING batch
+            WHERE {table}.{pk} = batch.{pk}
+            RETURNING {table}.{pk}
+        """
+
+        started = time.monotonic()
+        last_pk = uuid.UUID(int=0)
+        deleted = 0
+        batches = 0
+
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, [cutoff, last_pk, batch_size])
+                pks = [row[0] for row in cursor.fetchall()]
+
+            if not pks:
+                break
+
+            last_pk = max(pks)
+            deleted += len(pks)
+            batches += 1
+
+            if batches % 10 == 0:
+                elapsed = time.monotonic() - started
                 logger.info(
-                    f"Detected {severity} encroachment in AOI {aoi.name} "
-                    f"with confidence {confidence_score:.2f}"
+                    f"Deleted {deleted} {table} rows so far "
+                    f"({deleted / elapsed:.0f} rows/s)"
                 )
 
-            return encroachments
+            if len(pks) < batch_size:
+                break
 
-        except Exception as e:
-            logger.error(f"Error detecting encroachment for AOI {aoi.name}: {e}")
-            return []
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Deleted {deleted} {table} rows older than {cutoff:%Y-%m-%d} "
+            f"in {batches} batches, {elapsed:.1f}s "
+            f"({deleted / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        return deleted
+
+
+class JobMetricsService:
+    """Service for aggregating the stage metrics recorded on monitoring jobs"""
 
     @staticmethod
-    def analyze_image_with_ai(image_url: str, aoi_geometry: Polygon) -> dict:
-        """Analyze satellite image using AI/ML models"""
-        # In a real implementation, this would:
-        # 1. Load pre-trained models (e.g., using TensorFlow/PyTorch)
-        # 2. Preprocess the satellite image
-        # 3. Run inference for change detection
-        # 4. Post-process results
+    def get_stage_percentiles(since) -> dict:
+        """p50/p95 of each stage's duration and queries over completed jobs.
+
+        Includes a "total" stage for the whole run, and p50/p95 of raster
+        bytes read and peak RSS growth per job.
+        """
+        completed = "status = 'completed' AND completed_at >= %(since)s"
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH stages AS (
+                    SELECT stage.key AS stage,
+                           (stage.value ->> 'seconds')::float AS seconds,
+                           (stage.value ->> 'queries')::float AS queries
+                    FROM monitoring_job,
+                         jsonb_each(stage_metrics -> 'stages') AS stage
+                    WHERE {completed}
+                    UNION ALL
+                    SELECT 'total',
+                           (stage_metrics ->> 'total_seconds')::float,
+                           (stage_metrics ->> 'queries')::float
+                    FROM monitoring_job
+                    WHERE {completed} AND stage_metrics ? 'total_seconds'
+                )
+                SELECT stage, count(*),
+                       percentile_cont(ARRAY[0.5, 0.95])
+                           WITHIN GROUP (ORDER BY seconds),
+                       percentile_cont(ARRAY[0.5, 0.95])
+                           WITHIN GROUP (ORDER BY queries)
+                FROM stages
+                GROUP BY stage
+                ORDER BY stage = 'total', stage
+                """,
+                {"since": since},
+            )
+            stages = [
+                {
+                    "stage": stage,
+                    "jobs": count,
+                    "seconds_p50": seconds[0],
+                    "seconds_p95": seconds[1],
+                    "queries_p50": queries[0],
+                    "queries_p95": queries[1],
+                }
+                for stage, count, seconds, queries in cursor.fetchall()
+            ]
+
+            cursor.execute(
+                f"""
+                SELECT count(*),
+                       percentile_cont(ARRAY[0.5, 0.95]) WITHIN GROUP (
+                           ORDER BY (stage_metrics ->> 'bytes_read')::float
+                       ),
+                       percentile_cont(ARRAY[0.5, 0.95]) WITHIN GROUP (
+                           ORDER BY (stage_metrics ->> 'peak_rss_growth_bytes')::float
+                       )
+                FROM monitoring_job
+                WHERE {completed} AND stage_metrics ? 'peak_rss_growth_bytes'
+                """,
+                {"since": since},
+            )
+            count, bytes_read, peak_rss_growth = cursor.fetchone()
 
-        # For demo, return simulated results
         return {
-            "change_detected": np.random.random() > 0.8,
-            "confidence": np.random.uniform(0.6, 0.95),
-            "change_type": np.random.choice(
-                ["deforestation", "construction", "mining", "agriculture"]
+            "stages": stages,
+            "jobs": count,
+            "bytes_read_p50": bytes_read[0] if bytes_read else None,
+            "bytes_read_p95": bytes_read[1] if bytes_read else None,
+            "peak_rss_growth_bytes_p50": (
+                peak_rss_growth[0] if peak_rss_growth else None
+            ),
+            "peak_rss_growth_bytes_p95": (
+                peak_rss_growth[1] if peak_rss_growth else None
             ),
-            "affected_area_percentage": np.random.uniform(0.1, 5.0),
         }
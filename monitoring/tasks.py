@@ -1,4 +1,6 @@
-from celery import shared_task
+from celery import group, shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.gis.geos import Polygon
 from django.contrib.gis.db.models import Q
@@ -8,57 +10,109 @@ from datetime import timedelta
 import logging
 
 from aoi.models import Aoi, EncroachmentDetection
+from aoi.tiles import invalidate_tiles
+from asset_watch.partitioning import drop_expired_partitions, ensure_partitions
 from notifications.services import NotificationService
 from .models import MonitoringJob, SatelliteImage
-from .services import EncroachmentDetectionService, SatelliteImageService
+from .profiling import JobMetrics
+from .services import (
+    MONITORING_PRIORITIES,
+    EncroachmentDetectionService,
+    MonitoringSchedulerService,
+    RetentionService,
+    SatelliteImageService,
+)
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task(bind=True)
-def monitor_aoi_task(self, aoi_id):
-    """Monitor a single AOI for encroachments"""
+def monitor_aoi_task(self, aoi_id, job_id=None, reprocess=False):
+    """Monitor a single AOI for encroachments.
+
+    job_id is the pending job created when the task was queued; the run is
+    skipped if that job is no longer pending. Only images not yet processed
+    for the AOI are analysed, unless reprocess is set to force a full re-run
+    over the lookback window.
+    """
+    job = None
+    metrics = JobMetrics()
     try:
-        aoi = Aoi.objects.get(id=aoi_id, status="active")
+        if job_id is None:
+            jobs = MonitoringSchedulerService.create_jobs([aoi_id])
+            if not jobs:
+                logger.info(f"Monitoring job already open for AOI {aoi_id}")
+                return {"error": "Monitoring job already open for this AOI"}
+            job_id = jobs[str(aoi_id)].id
 
-        # Create monitoring job
-        job = MonitoringJob.objects.create(
-            aoi=aoi, status="running", celery_task_id=self.request.id
-        )
+        if not MonitoringSchedulerService.start_job(job_id):
+            logger.info(f"Monitoring job {job_id} is no longer pending, skipping")
+            return {"error": "Monitoring job is no longer pending"}
+
+        job = MonitoringJob.objects.get(id=job_id)
+        if job.celery_task_id != self.request.id:
+            job.celery_task_id = self.request.id or ""
+            job.save(update_fields=["celery_task_id"])
+
+        aoi = Aoi.objects.select_related("user").get(id=aoi_id, status="active")
 
         logger.info(f"Starting monitoring for AOI {aoi.name}")
 
         # Get recent satellite images covering the AOI
-        images = SatelliteImageService.get_images_for_aoi(
-            aoi, start_date=timezone.now() - timedelta(days=7)
+        with metrics.stage("scene_lookup"):
+            images = SatelliteImageService.get_images_for_aoi(
+                aoi, start_date=timezone.now() - timedelta(days=7), reprocess=reprocess
+            )
+
+        # Windows are read here while change detection runs on the worker's
+        # process pool, one image ahead of the next
+        results = EncroachmentDetectionService.detect_encroachment_images(
+            aoi, list(images), metrics
         )
 
-        encroachments_found = 0
-        images_processed = 0
-
-        for image in images:
-            try:
-                # Process image for encroachment detection
-                encroachments = EncroachmentDetectionService.detect_encroachment(
-                    aoi, image
-                )
-
-                encroachments_found += len(encroachments)
-                images_processed += 1
-
-                # Create notifications for detected encroachments
-                for encroachment in encroachments:
-                    NotificationService.create_encroachment_notification(encroachment)
-
-            except Exception as e:
-                logger.error(f"Error processing image {image.scene_id}: {e}")
-                continue
+        # Images that failed are not recorded as processed, and are retried
+        # as scene runs since they may be out of the next run's window
+        analysed_images = [image for image in images if str(image.id) in results]
+        failed_images = [image for image in images if str(image.id) not in results]
+        if failed_images:
+            retrying = [
+                retry_scene_monitoring(image.id, [aoi.id], attempt=0)
+                for image in failed_images
+            ]
+            logger.warning(
+                f"{len(failed_images)} images failed for AOI {aoi.name}"
+                f"{' and will be retried' if all(retrying) else ', giving up'}"
+            )
+        encroachments = [
+            encroachment
+            for image in analysed_images
+            for encroachment in results[str(image.id)]
+        ]
+
+        # Write the whole run's detections with its processed scene records
+        with metrics.stage("persistence"), transaction.atomic():
+            EncroachmentDetection.objects.bulk_create(encroachments, batch_size=500)
+            SatelliteImageService.mark_images_processed(aoi, analysed_images)
+
+        if encroachments:
+            invalidate_tiles([aoi.user_id], ["encroachments"])
+
+        encroachments_found = len(encroachments)
+        images_processed = len(analysed_images)
+
+        # Create notifications for detected encroachments in one batch
+        try:
+            with metrics.stage("notifications"):
+                NotificationService.create_encroachment_notifications(encroachments)
+        except Exception as e:
+            logger.error(f"Error notifying encroachments for AOI {aoi.name}: {e}")
 
         # Update job status
         job.status = "completed"
         job.completed_at = timezone.now()
         job.images_processed = images_processed
         job.encroachments_detected = encroachments_found
+        job.stage_metrics = metrics.as_dict()
         job.save()
 
         logger.info(
@@ -72,8 +126,13 @@ def monitor_aoi_task(self, aoi_id):
             "encroachments_detected": encroachments_found,
         }
 
-    except AOI.DoesNotExist:
+    except Aoi.DoesNotExist:
         logger.error(f"AOI {aoi_id} not found or not active")
+        job.status = "failed"
+        job.error_message = "AOI not found or not active"
+        job.completed_at = timezone.now()
+        job.stage_metrics = metrics.as_dict()
+        job.save()
         return {"error": "AOI not found or not active"}
 
     except Exception as e:
@@ -84,6 +143,7 @@ def monitor_aoi_task(self, aoi_id):
             job.status = "failed"
             job.error_message = str(e)
             job.completed_at = timezone.now()
+            job.stage_metrics = metrics.as_dict()
             job.save()
         except:
             pass
@@ -93,90 +153,302 @@ def monitor_aoi_task(self, aoi_id):
 
 @shared_task
 def schedule_monitoring_jobs():
-    """Schedule monitoring jobs for active AOIs"""
-    active_aois = Aoi.objects.filter(
-        status="active", is_paid=True, end_date__gt=timezone.now()
-    )
-
+    """Schedule monitoring jobs for AOIs whose next run is due.
+
+    Runs every minute. Due AOIs are claimed in batches of
+    MONITORING_DISPATCH_CHUNK_SIZE, up to MONITORING_SCHEDULE_MAX_PER_RUN per
+    run, so work is spread over the hour and several schedulers can run at
+    once without claiming the same AOI.
+    """
+    now = timezone.now()
+    chunk_size = settings.MONITORING_DISPATCH_CHUNK_SIZE
+    max_claims = settings.MONITORING_SCHEDULE_MAX_PER_RUN
+
+    aois_claimed = 0
     jobs_scheduled = 0
 
-    for aoi in active_aois:
-        # Check if we should run monitoring based on monitoring type
-        should_monitor = False
-        last_job = (
-            aoi.monitoring_jobs.filter(status="completed")
-            .order_by("-completed_at")
-            .first()
-        )
-
-        now = timezone.now()
-
-        if not last_job:
-            should_monitor = True
-        elif aoi.monitoring_type == "daily":
-            should_monitor = last_job.completed_at < now - timedelta(hours=23)
-        elif aoi.monitoring_type == "monthly":
-            should_monitor = last_job.completed_at < now - timedelta(days=29)
-        elif aoi.monitoring_type == "yearly":
-            should_monitor = last_job.completed_at < now - timedelta(days=364)
+    while aois_claimed < max_claims:
+        limit = min(chunk_size, max_claims - aois_claimed)
+        aois = MonitoringSchedulerService.claim_due_aois(now, limit=limit)
+        if not aois:
+            break
+        aois_claimed += len(aois)
+
+        # AOIs with a run still open get no new job, so are only rescheduled
+        jobs = MonitoringSchedulerService.create_jobs([aoi.id for aoi in aois])
+        if jobs:
+            monitoring_types = {str(aoi.id): aoi.monitoring_type for aoi in aois}
+            try:
+                group(
+                    monitor_aoi_task.s(aoi_id, job_id=str(job.id)).set(
+                        task_id=job.celery_task_id,
+                        priority=MONITORING_PRIORITIES[monitoring_types[aoi_id]],
+                    )
+                    for aoi_id, job in jobs.items()
+                ).apply_async()
+            except Exception as e:
+                # Tasks that did get published skip their failed job, and the
+                # AOIs are claimed again by the next run
+                logger.error(f"Failed to queue {len(jobs)} monitoring jobs: {e}")
+                MonitoringSchedulerService.fail_jobs(
+                    [job.id for job in jobs.values()], "Failed to queue monitoring task"
+                )
+                MonitoringSchedulerService.release_aois(list(jobs), now)
+                raise
+            jobs_scheduled += len(jobs)
 
-        if should_monitor:
-            # Check if there's already a pending/running job
-            existing_job = aoi.monitoring_jobs.filter(
-                status__in=["pending", "running"]
-            ).exists()
+    logger.info(
+        f"Scheduled {jobs_scheduled} monitoring jobs "
+        f"({aois_claimed} due AOIs claimed)"
+    )
+    return {"aois_claimed": aois_claimed, "jobs_scheduled": jobs_scheduled}
 
-            if not existing_job:
-                monitor_aoi_task.delay(str(aoi.id))
-                jobs_scheduled += 1
 
-    logger.info(f"Scheduled {jobs_scheduled} monitoring jobs")
-    return {"jobs_scheduled": jobs_scheduled}
+@shared_task
+def reap_stale_monitoring_jobs():
+    """Fail monitoring jobs stuck pending or running past their timeout"""
+    jobs_reaped = MonitoringSchedulerService.reap_stale_jobs()
+    if jobs_reaped:
+        logger.warning(f"Marked {jobs_reaped} stale monitoring jobs as failed")
+    return {"jobs_reaped": jobs_reaped}
 
 
 @shared_task
 def fetch_satellite_images():
     """Fetch new satellite images from various sources"""
     try:
-        images_fetched = SatelliteImageService.fetch_latest_images()
-        logger.info(f"Fetched {images_fetched} new satellite images")
-        return {"images_fetched": images_fetched}
+        image_ids = SatelliteImageService.fetch_latest_images()
+        logger.info(f"Fetched {len(image_ids)} new satellite images")
+
+        fan_out = dispatch_scene_monitoring(image_ids)
+
+        return {"images_fetched": len(image_ids), **fan_out}
 
     except Exception as e:
         logger.error(f"Error fetching satellite images: {e}")
         raise
 
 
-@shared_task
-def cleanup_old_data():
-    """Clean up old monitoring jobs and notifications"""
+def dispatch_scene_monitoring(image_ids):
+    """Fan newly ingested scenes out to the active AOIs they intersect.
+
+    All scenes are matched against the AOI table in a single spatial query,
+    then one monitor_scene_task is enqueued per scene and chunk of AOIs.
+    """
+    if not image_ids:
+        return {"scenes_matched": 0, "scene_tasks_scheduled": 0}
+
+    chunk_size = settings.MONITORING_DISPATCH_CHUNK_SIZE
+    matches = SatelliteImageService.match_images_to_aois(image_ids)
+
+    tasks = [
+        monitor_scene_task.s(image_id, aoi_ids[i : i + chunk_size])
+        for image_id, aoi_ids in matches.items()
+        for i in range(0, len(aoi_ids), chunk_size)
+    ]
+    if tasks:
+        group(tasks).apply_async()
+
+    logger.info(
+        f"Matched {len(matches)} of {len(image_ids)} new scenes to active AOIs, "
+        f"scheduled {len(tasks)} scene monitoring tasks"
+    )
+    return {"scenes_matched": len(matches), "scene_tasks_scheduled": len(tasks)}
+
+
+def retry_scene_monitoring(image_id, aoi_ids, attempt: int) -> bool:
+    """Queue monitor_scene_task again for AOIs a scene run could not finish.
+
+    Scheduled monitor_aoi_task runs only look back a week, which is shorter
+    than most monitoring intervals, so the scene is retried here instead.
+    Retries back off from MONITORING_SCENE_RETRY_DELAY and stop after
+    MONITORING_SCENE_RETRIES; returns whether one was queued.
+    """
+    if not aoi_ids or attempt >= settings.MONITORING_SCENE_RETRIES:
+        return False
+
+    monitor_scene_task.apply_async(
+        (str(image_id), [str(aoi_id) for aoi_id in aoi_ids]),
+        {"attempt": attempt + 1},
+        countdown=settings.MONITORING_SCENE_RETRY_DELAY * 2**attempt,
+    )
+    return True
+
+
+@shared_task(bind=True)
+def monitor_scene_task(self, image_id, aoi_ids, attempt=0):
+    """Run batched encroachment detection for one scene over the AOIs it covers.
+
+    A running job is opened for each AOI before it is analysed, so the open
+    job constraint keeps scene runs and monitor_aoi_task runs from analysing
+    the same AOI at once. AOIs that already have an open job, and AOIs whose
+    analysis fails, are retried with retry_scene_monitoring.
+    """
     try:
-        from notifications.models import Notification
+        image = SatelliteImage.objects.get(id=image_id)
+    except SatelliteImage.DoesNotExist:
+        logger.error(f"Satellite image {image_id} not found")
+        return {"error": "Satellite image not found"}
+
+    active_ids = list(
+        Aoi.objects.filter(id__in=aoi_ids, status="active").values_list("id", flat=True)
+    )
+    jobs = MonitoringSchedulerService.create_jobs(
+        active_ids, status="running", celery_task_id=self.request.id or ""
+    )
+    busy_ids = [aoi_id for aoi_id in map(str, active_ids) if aoi_id not in jobs]
+    if busy_ids:
+        retrying = retry_scene_monitoring(image.id, busy_ids, attempt)
+        logger.info(
+            f"{len(busy_ids)} AOIs already have an open monitoring job, "
+            f"{'retrying' if retrying else 'skipping'} them for {image.scene_id}"
+        )
+    if not jobs:
+        return {
+            "image_id": str(image.id),
+            "aois_processed": 0,
+            "encroachments_detected": 0,
+        }
 
-        cutoff_date = timezone.now() - timedelta(days=90)
+    # The jobs share one scene run, so each records the whole run's metrics
+    metrics = JobMetrics()
+    try:
+        # Skip AOIs that have already analysed this scene, checked after the
+        # jobs are claimed so a run that just finished is seen
+        with metrics.stage("scene_lookup"):
+            aois = (
+                Aoi.objects.filter(id__in=list(jobs))
+                .exclude(processed_scenes__satellite_image=image)
+                .select_related("user")
+            )
+            aois = {str(aoi.id): aoi for aoi in aois}
+
+        # Analyse all AOIs in batches that share raster reads and model passes
+        with metrics.stage("detection"):
+            results = EncroachmentDetectionService.detect_encroachment_batch(
+                list(aois.values()), image
+            )
+
+        # AOIs whose batch failed are not recorded as processed
+        processed_aois = [aois[aoi_id] for aoi_id in results]
+        failed_ids = [aoi_id for aoi_id in aois if aoi_id not in results]
+        encroachments = [
+            encroachment
+            for aoi_encroachments in results.values()
+            for encroachment in aoi_encroachments
+        ]
+        encroachments_found = len(encroachments)
+
+        # Write the scene's detections with its processed scene records
+        with metrics.stage("persistence"), transaction.atomic():
+            EncroachmentDetection.objects.bulk_create(encroachments, batch_size=500)
+            SatelliteImageService.mark_scene_processed(image, processed_aois)
 
+    except Exception as e:
+        logger.error(f"Error monitoring scene {image.scene_id}: {e}")
+        MonitoringJob.objects.filter(id__in=[job.id for job in jobs.values()]).update(
+            status="failed",
+            error_message=str(e),
+            completed_at=timezone.now(),
+            stage_metrics=metrics.as_dict(),
+        )
+        retry_scene_monitoring(image.id, list(jobs), attempt)
+        raise
+
+    if failed_ids:
+        retrying = retry_scene_monitoring(image.id, failed_ids, attempt)
+        logger.warning(
+            f"{len(failed_ids)} AOIs failed for {image.scene_id}"
+            f"{' and will be retried' if retrying else ', giving up'}"
+        )
+
+    invalidate_tiles(
+        [encroachment.aoi.user_id for encroachment in encroachments],
+        ["encroachments"],
+    )
+
+    try:
+        with metrics.stage("notifications"):
+            NotificationService.create_encroachment_notifications(encroachments)
+    except Exception as e:
+        logger.error(f"Error notifying encroachments for {image.scene_id}: {e}")
+
+    # Close the jobs, failing those of AOIs whose batch failed
+    now = timezone.now()
+    stage_metrics = metrics.as_dict()
+    for aoi_id, job in jobs.items():
+        job.completed_at = now
+        job.stage_metrics = stage_metrics
+        if aoi_id in aois and aoi_id not in results:
+            job.status = "failed"
+            job.error_message = f"Detection failed for {image.scene_id}"
+            continue
+        job.status = "completed"
+        if aoi_id in results:
+            job.images_processed = 1
+            job.encroachments_detected = len(results[aoi_id])
+    MonitoringJob.objects.bulk_update(
+        jobs.values(),
+        [
+            "status",
+            "completed_at",
+            "error_message",
+            "images_processed",
+            "encroachments_detected",
+            "stage_metrics",
+        ],
+    )
+
+    aois_processed = len(processed_aois)
+
+    logger.info(
+        f"Completed scene monitoring for {image.scene_id}. "
+        f"Processed {aois_processed} AOIs, found {encroachments_found} encroachments"
+    )
+
+    return {
+        "image_id": str(image.id),
+        "aois_processed": aois_processed,
+        "encroachments_detected": encroachments_found,
+    }
+
+
+@shared_task
+def cleanup_old_data():
+    """Clean up old monitoring jobs and notifications.
+
+    Monitoring jobs are deleted in small committed batches, so the task can
+    be killed and rerun at any point. Notifications (and detections, if
+    ENCROACHMENT_RETENTION_DAYS is set) are removed by dropping whole
+    monthly partitions past their retention.
+    """
+    try:
         # Clean up old monitoring jobs
-        old_jobs = MonitoringJob.objects.filter(completed_at__lt=cutoff_date)
-        jobs_deleted = old_jobs.count()
-        old_jobs.delete()
-
-        # Clean up old notifications (keep for 30 days)
-        notification_cutoff = timezone.now() - timedelta(days=30)
-        old_notifications = Notification.objects.filter(
-            created_at__lt=notification_cutoff
+        jobs_deleted = RetentionService.delete_older_than(
+            MonitoringJob, "completed_at", timezone.now() - timedelta(days=90)
         )
-        notifications_deleted = old_notifications.count()
-        old_notifications.delete()
+
+        partitions_dropped = drop_expired_partitions()
 
         logger.info(
-            f"Cleanup completed: {jobs_deleted} jobs, {notifications_deleted} notifications deleted"
+            f"Cleanup completed: {jobs_deleted} jobs deleted, "
+            f"{len(partitions_dropped)} partitions dropped"
         )
 
         return {
             "jobs_deleted": jobs_deleted,
-            "notifications_deleted": notifications_deleted,
+            "partitions_dropped": partitions_dropped,
         }
 
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
         raise
+
+
+@shared_task
+def maintain_partitions():
+    """Create the upcoming monthly partitions of partitioned tables"""
+    created = ensure_partitions(settings.PARTITION_MONTHS_AHEAD)
+    if created:
+        logger.info(f"Created partitions: {', '.join(created)}")
+    return {"partitions_created": created}
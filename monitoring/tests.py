@@ -1,3 +1,499 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import datetime, timezone
 
-# Create your tests here.
+import numpy as np
+from django.contrib.gis.gdal import GDALRaster
+from django.contrib.gis.geos import (
+    GeometryCollection,
+    LineString,
+    MultiPolygon,
+    Point,
+    Polygon,
+)
+from django.test import SimpleTestCase, override_settings
+
+from aoi.models import Aoi
+from .detection import (
+    detect_changes,
+    detect_changes_batch,
+    find_runs,
+    label_runs,
+    rasterize_polygon,
+    stack_crops,
+)
+from .models import SatelliteImage
+from .raster import TileCache, WindowedRasterReader, get_raster_reader, read_window
+from .services import EncroachmentDetectionService
+
+# 10 x 10 raster of 1-unit pixels with its origin at the top left corner (0, 10)
+GEOTRANSFORM = (0.0, 1.0, 0.0, 10.0, 0.0, -1.0)
+SHAPE = (10, 10)
+
+
+def label_mask(mask, connectivity=8):
+    """Label the True pixels of mask, returning one label per run"""
+    rows, starts, ends = find_runs(mask)
+    return label_runs(rows, starts, ends, mask.shape[1], connectivity)
+
+
+def bands(red, nir, swir=0.1):
+    return {
+        "red": np.full(SHAPE, red, dtype=np.float32),
+        "nir": np.full(SHAPE, nir, dtype=np.float32),
+        "swir": np.full(SHAPE, swir, dtype=np.float32),
+    }
+
+
+def write_geotiff(path, bands, origin, scale=(1.0, -1.0), srid=3857):
+    """Write 2-D float32 arrays as the bands of a GeoTIFF at path"""
+    height, width = bands[0].shape
+    raster = GDALRaster(
+        {
+            "driver": "GTiff",
+            "name": path,
+            "srid": srid,
+            "width": width,
+            "height": height,
+            "origin": origin,
+            "scale": scale,
+            "datatype": 6,
+            "bands": [{"data": band.ravel()} for band in bands],
+        }
+    )
+    # Dropping the dataset flushes it to disk
+    del raster
+
+
+def geographic_bbox(bbox):
+    """Polygon of a bbox in EPSG:3857, transformed to EPSG:4326"""
+    polygon = Polygon.from_bbox(bbox)
+    polygon.srid = 3857
+    return polygon.transform(4326, clone=True)
+
+
+class RasterizePolygonTests(SimpleTestCase):
+    def test_square(self):
+        square = Polygon.from_bbox((2, 3, 5, 7))
+        mask = rasterize_polygon(square, GEOTRANSFORM, SHAPE)
+
+        expected = np.zeros(SHAPE, dtype=bool)
+        # Rows count down from y=10, so y 3..7 covers rows 3..6
+        expected[3:7, 2:5] = True
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_hole_is_excluded(self):
+        shell = ((1, 1), (1, 9), (9, 9), (9, 1), (1, 1))
+        hole = ((4, 4), (4, 6), (6, 6), (6, 4), (4, 4))
+        mask = rasterize_polygon(Polygon(shell, hole), GEOTRANSFORM, SHAPE)
+
+        self.assertEqual(mask.sum(), 8 * 8 - 2 * 2)
+        self.assertFalse(mask[4:6, 4:6].any())
+
+    def test_polygon_outside_raster(self):
+        far_away = Polygon.from_bbox((20, 20, 30, 30))
+        mask = rasterize_polygon(far_away, GEOTRANSFORM, SHAPE)
+
+        self.assertFalse(mask.any())
+
+
+class FindRunsTests(SimpleTestCase):
+    def test_runs_are_ordered_with_exclusive_ends(self):
+        mask = np.array(
+            [
+                [1, 1, 0, 1],
+                [0, 0, 0, 0],
+                [0, 1, 1, 1],
+            ],
+            dtype=bool,
+        )
+        rows, starts, ends = find_runs(mask)
+
+        np.testing.assert_array_equal(rows, [0, 0, 2])
+        np.testing.assert_array_equal(starts, [0, 3, 1])
+        np.testing.assert_array_equal(ends, [2, 4, 4])
+
+    def test_empty_mask(self):
+        rows, starts, ends = find_runs(np.zeros(SHAPE, dtype=bool))
+
+        self.assertEqual(len(rows), 0)
+        self.assertEqual(len(label_runs(rows, starts, ends, SHAPE[1])), 0)
+
+
+class LabelRunsTests(SimpleTestCase):
+    def test_separate_blobs(self):
+        mask = np.zeros(SHAPE, dtype=bool)
+        mask[1:3, 1:3] = True
+        mask[6:9, 5:8] = True
+
+        labels = label_mask(mask)
+
+        # Two runs for the first blob, three for the second
+        np.testing.assert_array_equal(labels, [0, 0, 1, 1, 1])
+
+    def test_diagonal_connectivity(self):
+        mask = np.eye(4, dtype=bool)
+
+        self.assertEqual(len(set(label_mask(mask, connectivity=8))), 1)
+        self.assertEqual(len(set(label_mask(mask, connectivity=4))), 4)
+
+    def test_u_shape_is_merged(self):
+        # Both arms only join on the bottom row
+        mask = np.array(
+            [
+                [1, 0, 0, 1],
+                [1, 0, 0, 1],
+                [1, 1, 1, 1],
+            ],
+            dtype=bool,
+        )
+
+        labels = label_mask(mask, connectivity=4)
+
+        self.assertEqual(len(labels), 5)
+        self.assertEqual(len(set(labels)), 1)
+
+
+class DetectChangesTests(SimpleTestCase):
+    def test_changed_block_is_detected(self):
+        before = bands(red=0.1, nir=0.5)
+        after = bands(red=0.1, nir=0.5)
+        # Vegetation is cleared in a 4 x 3 block
+        after["red"][2:6, 3:6] = 0.4
+        after["nir"][2:6, 3:6] = 0.2
+
+        regions = detect_changes(before, after, GEOTRANSFORM, srid=3857)
+
+        self.assertEqual(len(regions), 1)
+        region = regions[0]
+        self.assertEqual(region["pixel_count"], 12)
+        self.assertAlmostEqual(region["area_m2"], 12.0)
+        self.assertGreater(region["confidence"], 0.0)
+        self.assertEqual(region["polygon"].srid, 3857)
+        self.assertTrue(region["polygon"].equals(Polygon.from_bbox((3, 4, 6, 8))))
+
+    def test_no_change(self):
+        before = bands(red=0.1, nir=0.5)
+
+        self.assertEqual(detect_changes(before, before, GEOTRANSFORM, srid=3857), [])
+
+    def test_small_regions_and_masked_pixels_are_ignored(self):
+        before = bands(red=0.1, nir=0.5)
+        after = bands(red=0.4, nir=0.2)
+        mask = np.zeros(SHAPE, dtype=bool)
+        mask[0:2, 0:2] = True
+
+        regions = detect_changes(
+            before, after, GEOTRANSFORM, srid=3857, mask=mask, min_pixels=9
+        )
+
+        self.assertEqual(regions, [])
+
+
+class DetectChangesBatchTests(SimpleTestCase):
+    def test_matches_single_crops(self):
+        before = bands(red=0.1, nir=0.5)
+        after = bands(red=0.1, nir=0.5)
+        # The cleared block straddles the edge between the two crops
+        after["red"][3:8, 3:7] = 0.4
+        after["nir"][3:8, 3:7] = 0.2
+
+        # Rows 0..5 and 5..10 of the scene, the second crop narrower and
+        # offset so it is padded on the right when stacked
+        windows = [(slice(0, 5), slice(0, 8)), (slice(5, 10), slice(2, 8))]
+        crops = [
+            {
+                "before": {name: band[rows, cols] for name, band in before.items()},
+                "after": {name: band[rows, cols] for name, band in after.items()},
+                "geotransform": (
+                    float(cols.start),
+                    1.0,
+                    0.0,
+                    10.0 - rows.start,
+                    0.0,
+                    -1.0,
+                ),
+                "mask": np.ones((rows.stop - rows.start, cols.stop - cols.start), bool),
+            }
+            for rows, cols in windows
+        ]
+
+        single = [
+            detect_changes(
+                crop["before"],
+                crop["after"],
+                crop["geotransform"],
+                srid=3857,
+                mask=crop["mask"],
+                min_pixels=4,
+            )
+            for crop in crops
+        ]
+        batched = detect_changes_batch(
+            {
+                name: stack_crops([crop["before"][name] for crop in crops])
+                for name in before
+            },
+            {
+                name: stack_crops([crop["after"][name] for crop in crops])
+                for name in after
+            },
+            [crop["geotransform"] for crop in crops],
+            stack_crops([crop["mask"] for crop in crops], fill=False),
+            srid=3857,
+            min_pixels=4,
+        )
+
+        # Each crop keeps its own part of the block rather than one merged region
+        self.assertEqual([len(regions) for regions in batched], [1, 1])
+        self.assertEqual(batched[0][0]["pixel_count"], 2 * 4)
+        self.assertEqual(batched[1][0]["pixel_count"], 3 * 4)
+        for batched_regions, single_regions in zip(batched, single):
+            self.assertEqual(len(batched_regions), len(single_regions))
+            for batched_region, single_region in zip(batched_regions, single_regions):
+                self.assertTrue(
+                    batched_region["polygon"].equals(single_region["polygon"])
+                )
+                for key in ("pixel_count", "area_m2", "mean_change", "confidence"):
+                    self.assertAlmostEqual(batched_region[key], single_region[key])
+
+
+class PolygonalAreaTests(SimpleTestCase):
+    def test_polygon_is_kept(self):
+        square = Polygon.from_bbox((0, 0, 1, 1))
+
+        self.assertIs(EncroachmentDetectionService.polygonal_area(square), square)
+
+    def test_lines_and_points_are_dropped(self):
+        line = LineString((0, 0), (1, 0), srid=4326)
+        collection = GeometryCollection(Point(0, 0), line, srid=4326)
+
+        self.assertIsNone(EncroachmentDetectionService.polygonal_area(line))
+        self.assertIsNone(EncroachmentDetectionService.polygonal_area(Point(0, 0)))
+        self.assertIsNone(EncroachmentDetectionService.polygonal_area(collection))
+
+    def test_polygonal_parts_of_a_collection(self):
+        square = Polygon.from_bbox((0, 0, 1, 1))
+        collection = GeometryCollection(square, LineString((1, 1), (3, 3)), srid=4326)
+
+        area = EncroachmentDetectionService.polygonal_area(collection)
+
+        self.assertTrue(area.equals(square))
+
+    def test_several_parts_are_merged(self):
+        parts = MultiPolygon(
+            Polygon.from_bbox((0, 0, 1, 1)), Polygon.from_bbox((2, 0, 3, 1)), srid=4326
+        )
+
+        area = EncroachmentDetectionService.polygonal_area(parts)
+
+        self.assertIsInstance(area, Polygon)
+        self.assertEqual(area.srid, 4326)
+        self.assertAlmostEqual(area.area, 3.0)
+
+
+class WindowedRasterReaderTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        # Every pixel has its own value, so misplaced blocks show up
+        values = np.arange(100, dtype=np.float32).reshape(SHAPE)
+        self.path = os.path.join(self.directory, "scene.tif")
+        write_geotiff(self.path, [values, values + 100, values + 200], (0.0, 10.0))
+
+    def test_window_across_block_edges(self):
+        reader = WindowedRasterReader(block_size=4)
+        # Columns 3..9 and rows 1..10 touch all nine 4-pixel blocks, including
+        # the partial blocks on the raster's right and bottom edges
+        bounds = (3, 0, 9, 9)
+
+        arrays, geotransform = reader.read_window("scene", self.path, bounds)
+        expected, expected_geotransform = read_window(self.path, bounds)
+
+        self.assertEqual(geotransform, expected_geotransform)
+        self.assertEqual(set(arrays), {"red", "nir", "swir"})
+        for name, band in expected.items():
+            self.assertEqual(arrays[name].dtype, np.float32)
+            np.testing.assert_array_equal(arrays[name], band)
+        self.assertEqual(reader.cache_misses, 3 * 9)
+        # Only whole blocks are read, partial ones at the raster edges
+        self.assertEqual(reader.bytes_read, 3 * 10 * 10 * 4)
+
+    def test_blocks_are_reused_from_the_cache(self):
+        cache = TileCache(os.path.join(self.directory, "tiles"), max_bytes=10**6)
+        reader = WindowedRasterReader(cache, block_size=4)
+
+        first, _ = reader.read_window("scene", self.path, (0, 6, 4, 10))
+        second, _ = reader.read_window("scene", self.path, (2, 4, 6, 8))
+
+        # The second window needs blocks (0, 0), (1, 0), (0, 1) and (1, 1),
+        # of which only (0, 0) was read for the first
+        self.assertEqual(reader.cache_misses, 3 * 4)
+        self.assertEqual(reader.cache_hits, 3)
+        np.testing.assert_array_equal(first["red"][2:, 2:], second["red"][:2, :2])
+
+
+class TileCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.block = np.arange(16, dtype=np.float32).reshape(4, 4)
+
+    def disk_size(self, cache):
+        return sum(os.path.getsize(path) for path in cache._files())
+
+    def recorded_size(self):
+        with open(os.path.join(self.directory, TileCache.SIZE_FILE)) as f:
+            return int(f.read())
+
+    def test_get_and_put(self):
+        cache = TileCache(self.directory, max_bytes=10**6)
+        key = ("S2A/scene:1", 1, 0, 2)
+
+        self.assertIsNone(cache.get(key))
+        cache.put(key, self.block)
+
+        np.testing.assert_array_equal(cache.get(key), self.block)
+        self.assertIsNone(cache.get(("S2A/scene:1", 2, 0, 2)))
+        # Scene ids are made safe to use as directory names
+        self.assertTrue(cache._path(key).startswith(self.directory))
+        self.assertIn("S2A_scene_1", cache._path(key))
+
+    def test_size_file_tracks_blocks(self):
+        cache = TileCache(self.directory, max_bytes=10**6)
+
+        cache.put(("scene", 1, 0, 0), self.block)
+        cache.put(("scene", 1, 1, 0), self.block)
+        self.assertEqual(self.recorded_size(), self.disk_size(cache))
+
+        # Replacing a block only counts the change in its size
+        cache.put(("scene", 1, 0, 0), np.zeros((2, 2), dtype=np.float32))
+        self.assertEqual(self.recorded_size(), self.disk_size(cache))
+
+    def test_missing_size_file_is_rebuilt_from_disk(self):
+        cache = TileCache(self.directory, max_bytes=10**6)
+        cache.put(("scene", 1, 0, 0), self.block)
+        os.remove(os.path.join(self.directory, TileCache.SIZE_FILE))
+
+        cache.put(("scene", 1, 1, 0), self.block)
+
+        self.assertEqual(self.recorded_size(), self.disk_size(cache))
+
+    def test_least_recently_used_blocks_are_evicted(self):
+        first, second, third = (("scene", 1, x, 0) for x in range(3))
+        cache = TileCache(self.directory, max_bytes=10**6)
+        cache.put(first, self.block)
+        cache.put(second, self.block)
+        block_bytes = os.path.getsize(cache._path(first))
+
+        # Room for two blocks; eviction goes down to 90% of that
+        cache.max_bytes = int(block_bytes * 2.5)
+        os.utime(cache._path(first), (1, 1))
+        os.utime(cache._path(second), (2, 2))
+        # Reading the first block makes the second the least recently used
+        cache.get(first)
+
+        cache.put(third, self.block)
+
+        self.assertIsNotNone(cache.get(first))
+        self.assertIsNone(cache.get(second))
+        self.assertIsNotNone(cache.get(third))
+        self.assertEqual(self.recorded_size(), 2 * block_bytes)
+
+    def test_eviction_corrects_size_drift(self):
+        cache = TileCache(self.directory, max_bytes=10**6)
+        cache.put(("scene", 1, 0, 0), self.block)
+        with open(os.path.join(self.directory, TileCache.SIZE_FILE), "w") as f:
+            f.write(str(10**7))
+
+        # The inflated size triggers an eviction, which finds nothing to
+        # delete and records the real size
+        cache.put(("scene", 1, 1, 0), self.block)
+
+        self.assertIsNotNone(cache.get(("scene", 1, 0, 0)))
+        self.assertEqual(self.recorded_size(), self.disk_size(cache))
+
+
+@override_settings(RASTER_CACHE_MAX_BYTES=0, RASTER_BLOCK_SIZE=4)
+class GeoTiffDetectionTests(SimpleTestCase):
+    """Read windows from GeoTIFFs on disk and detect changes end to end"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # The reader is built from settings, so rebuild it for the override
+        get_raster_reader.cache_clear()
+        self.addCleanup(get_raster_reader.cache_clear)
+
+        shape = (20, 20)
+        red = np.full(shape, 0.1, dtype=np.float32)
+        nir = np.full(shape, 0.5, dtype=np.float32)
+        swir = np.full(shape, 0.1, dtype=np.float32)
+        cleared_red, cleared_nir = red.copy(), nir.copy()
+        # Vegetation is cleared in a 6 x 6 block spanning several 4-pixel blocks
+        cleared_red[5:11, 5:11] = 0.4
+        cleared_nir[5:11, 5:11] = 0.2
+
+        before_path = os.path.join(directory.name, "before.tif")
+        after_path = os.path.join(directory.name, "after.tif")
+        write_geotiff(before_path, [red, nir, swir], origin=(0.0, 20.0))
+        write_geotiff(after_path, [cleared_red, cleared_nir, swir], origin=(0.0, 20.0))
+
+        footprint = geographic_bbox((0, 0, 20, 20))
+        self.reference_image = SatelliteImage(
+            scene_id="before",
+            acquisition_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            cloud_coverage=0.0,
+            geometry=footprint,
+            image_url=before_path,
+        )
+        self.image = SatelliteImage(
+            scene_id="after",
+            acquisition_date=datetime(2024, 2, 1, tzinfo=timezone.utc),
+            cloud_coverage=0.0,
+            geometry=footprint,
+            image_url=after_path,
+        )
+
+        # The AOI covers rows and columns 2..14 of the scenes
+        self.aoi = Aoi(name="Test AOI", geometry=geographic_bbox((2, 6, 14, 18)))
+
+    def test_changed_block_is_detected(self):
+        prepared = EncroachmentDetectionService.prepare_analysis(
+            self.image, self.aoi, self.reference_image
+        )
+
+        self.assertEqual(prepared["srid"], 3857)
+        # The window may gain a pixel from reprojection, the mask must not
+        self.assertEqual(prepared["mask"].sum(), 12 * 12)
+
+        regions = detect_changes(
+            prepared["before"],
+            prepared["after"],
+            prepared["geotransform"],
+            srid=prepared["srid"],
+            mask=prepared["mask"],
+            **EncroachmentDetectionService.get_detection_options(),
+        )
+
+        self.assertEqual(len(regions), 1)
+        self.assertEqual(regions[0]["pixel_count"], 36)
+        # Pixels 5..11 of the scene, whose top edge is at y=20
+        self.assertTrue(regions[0]["polygon"].equals(Polygon.from_bbox((5, 9, 11, 15))))
+
+        encroachments = EncroachmentDetectionService.build_encroachments(
+            self.aoi, self.image, self.reference_image, regions, "vegetation loss"
+        )
+
+        self.assertEqual(len(encroachments), 1)
+        encroachment = encroachments[0]
+        self.assertEqual(encroachment.affected_area.srid, 4326)
+        self.assertEqual(encroachment.satellite_image_url, self.image.image_url)
+        self.assertTrue(
+            encroachment.affected_area.equals_exact(
+                geographic_bbox((5, 9, 11, 15)), tolerance=1e-12
+            )
+        )
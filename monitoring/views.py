@@ -1,10 +1,16 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.utils import timezone
+from aoi.models import Aoi
+from asset_watch.geojson import GeoJSONRenderer, with_geojson
+from asset_watch.pagination import KeysetPagination
 from .models import MonitoringJob, SatelliteImage
 from .serializers import MonitoringJobSerializer, SatelliteImageSerializer
+from .services import MonitoringSchedulerService
 from .tasks import monitor_aoi_task
 
 
@@ -13,6 +19,8 @@ class MonitoringJobViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["status", "aoi"]
+    pagination_class = KeysetPagination
+    ordering = ["-started_at", "-id"]
 
     def get_queryset(self):
         return MonitoringJob.objects.filter(aoi__user=self.request.user)
@@ -21,6 +29,8 @@ class MonitoringJobViewSet(viewsets.ReadOnlyModelViewSet):
     def trigger_monitoring(self, request):
         """Manually trigger monitoring for user's AOIs"""
         aoi_id = request.data.get("aoi_id")
+        # Re-analyse images already processed for this AOI
+        reprocess = str(request.data.get("reprocess", "")).lower() in ("true", "1")
 
         if not aoi_id:
             return Response(
@@ -31,21 +41,40 @@ class MonitoringJobViewSet(viewsets.ReadOnlyModelViewSet):
             # Verify user owns the AOI
             aoi = request.user.aois.get(id=aoi_id, status="active", is_paid=True)
 
-            # Check for existing running job
-            existing_job = aoi.monitoring_jobs.filter(
-                status__in=["pending", "running"]
-            ).exists()
-
-            if existing_job:
+            # The job is created before queueing; the database rejects a
+            # second open job for the same AOI
+            jobs = MonitoringSchedulerService.create_jobs([aoi.id])
+            if not jobs:
                 return Response(
                     {"error": "Monitoring job already running for this AOI"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            job = jobs[str(aoi.id)]
 
-            # Trigger monitoring task
-            task = monitor_aoi_task.delay(str(aoi.id))
+            # Trigger monitoring task on the interactive worker, which
+            # scheduled runs never reach
+            try:
+                task = monitor_aoi_task.apply_async(
+                    (str(aoi.id),),
+                    {"job_id": str(job.id), "reprocess": reprocess},
+                    task_id=job.celery_task_id,
+                    queue="interactive",
+                    priority=0,
+                )
+            except Exception:
+                job.status = "failed"
+                job.error_message = "Failed to queue monitoring task"
+                job.completed_at = timezone.now()
+                job.save()
+                raise
 
-            return Response({"message": "Monitoring job started", "task_id": task.id})
+            return Response(
+                {
+                    "message": "Monitoring job started",
+                    "task_id": task.id,
+                    "job_id": str(job.id),
+                }
+            )
 
         except Aoi.DoesNotExist:
             return Response(
@@ -60,3 +89,7 @@ class SatelliteImageViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["satellite"]
+    renderer_classes = [GeoJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self):
+        return with_geojson(super().get_queryset(), "geometry")
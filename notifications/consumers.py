@@ -3,6 +3,8 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 
+from asset_watch.metrics import WEBSOCKET_CONNECTIONS
+
 User = get_user_model()
 
 
@@ -18,10 +20,12 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_add(self.group_name, self.channel_name)
 
             await self.accept()
+            WEBSOCKET_CONNECTIONS.inc()
 
     async def disconnect(self, close_code):
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            WEBSOCKET_CONNECTIONS.dec()
 
     async def notification_message(self, event):
         """Send notification to WebSocket"""
@@ -30,3 +34,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 {"type": "notification", "data": event["notification"]}
             )
         )
+
+    async def notification_batch(self, event):
+        """Send each notification of a batch to WebSocket"""
+        for notification in event["notifications"]:
+            await self.notification_message({"notification": notification})
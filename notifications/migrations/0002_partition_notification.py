@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from asset_watch.partitioning_v1 import convert_to_partitioned
+
+
+def partition_notification(apps, schema_editor):
+    convert_to_partitioned("notification", "created_at", schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("aoi", "0002_aoi_next_run_at"),
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="encroachment",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="aoi.encroachmentdetection",
+            ),
+        ),
+        migrations.RunPython(partition_notification),
+    ]
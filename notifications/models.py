@@ -42,16 +42,30 @@ class Notification(models.Model):
 
     # Related objects
     aoi = models.ForeignKey("aoi.AOI", on_delete=models.CASCADE, null=True, blank=True)
+    # A database foreign key cannot reference the partitioned detection table
     encroachment = models.ForeignKey(
-        "aoi.EncroachmentDetection", on_delete=models.CASCADE, null=True, blank=True
+        "aoi.EncroachmentDetection",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_constraint=False,
     )
     payment = models.ForeignKey(
         "payments.Payment", on_delete=models.CASCADE, null=True, blank=True
     )
 
     class Meta:
+        # Range-partitioned by month on created_at, with a primary key of
+        # (id, created_at) in the database; see asset_watch.partitioning
         db_table = "notification"
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of a user's notifications
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="notification_user_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email}"
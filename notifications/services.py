@@ -51,6 +51,40 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Failed to send real-time notification: {e}")
 
+    @staticmethod
+    def send_realtime_notifications(notifications):
+        """Send many real-time notifications via WebSocket.
+
+        Notifications are grouped by user, with one group_send per user
+        carrying all of that user's notifications.
+        """
+        by_user = {}
+        for notification in notifications:
+            by_user.setdefault(notification.user_id, []).append(
+                {
+                    "id": str(notification.id),
+                    "title": notification.title,
+                    "message": notification.message,
+                    "type": notification.notification_type,
+                    "created_at": notification.created_at.isoformat(),
+                }
+            )
+
+        async def group_send_all(channel_layer):
+            for user_id, user_notifications in by_user.items():
+                await channel_layer.group_send(
+                    f"user_{user_id}",
+                    {
+                        "type": "notification_batch",
+                        "notifications": user_notifications,
+                    },
+                )
+
+        try:
+            async_to_sync(group_send_all)(get_channel_layer())
+        except Exception as e:
+            logger.error(f"Failed to send real-time notifications: {e}")
+
     @staticmethod
     def send_sms_notification(notification):
         """Send SMS notification using Twilio"""
@@ -103,6 +137,93 @@ class NotificationService:
             encroachment=encroachment,
         )
 
+    @staticmethod
+    def create_encroachment_notifications(encroachments):
+        """Create notifications for many encroachment detections at once.
+
+        Notifications are written with a single bulk insert and pushed over
+        WebSocket together; each user with a phone number gets one SMS
+        covering all of their new detections.
+        """
+        notifications = []
+        for encroachment in encroachments:
+            aoi = encroachment.aoi
+            notifications.append(
+                Notification(
+                    user=aoi.user,
+                    title=f"Encroachment Detected in {aoi.name}",
+                    message=(
+                        f"We detected a {encroachment.severity} severity encroachment "
+                        f"in your AOI '{aoi.name}'. "
+                        f"Confidence: {encroachment.confidence_score:.2f}. "
+                        f"Please review and take appropriate action."
+                    ),
+                    notification_type="encroachment",
+                    aoi=aoi,
+                    encroachment=encroachment,
+                )
+            )
+
+        if not notifications:
+            return []
+
+        Notification.objects.bulk_create(notifications)
+        NotificationService.send_realtime_notifications(notifications)
+
+        by_user = {}
+        for notification in notifications:
+            if notification.user.phone_number:
+                by_user.setdefault(notification.user_id, []).append(notification)
+
+        for user_notifications in by_user.values():
+            if len(user_notifications) == 1:
+                NotificationService.send_sms_notification(user_notifications[0])
+            else:
+                NotificationService.send_sms_summary(user_notifications)
+
+        return notifications
+
+    @staticmethod
+    def send_sms_summary(notifications):
+        """Send one SMS summarizing several notifications for the same user"""
+        if not all(
+            [
+                settings.TWILIO_ACCOUNT_SID,
+                settings.TWILIO_AUTH_TOKEN,
+                settings.TWILIO_PHONE_NUMBER,
+            ]
+        ):
+            logger.warning("Twilio credentials not configured")
+            return
+
+        user = notifications[0].user
+        aoi_names = sorted({notification.aoi.name for notification in notifications})
+
+        try:
+            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+            message = client.messages.create(
+                body=f"{len(notifications)} encroachments detected\n\n"
+                f"New detections in your AOIs: {', '.join(aoi_names)}. "
+                f"Please review and take appropriate action.",
+                from_=settings.TWILIO_PHONE_NUMBER,
+                to=user.phone_number,
+            )
+
+            for notification in notifications:
+                notification.sms_message_id = message.sid
+                notification.sms_status = "sent"
+                notification.sms_sent_at = timezone.now()
+
+        except Exception as e:
+            for notification in notifications:
+                notification.sms_status = "failed"
+            logger.error(f"Failed to send SMS: {e}")
+
+        Notification.objects.bulk_update(
+            notifications, ["sms_message_id", "sms_status", "sms_sent_at"]
+        )
+
     @staticmethod
     def create_payment_notification(payment, success=True):
         """Create notification for payment events"""
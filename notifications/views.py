@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
+from asset_watch.pagination import KeysetPagination
 from .models import Notification
 from .serializers import NotificationSerializer
 from .filters import NotificationFilter
@@ -13,6 +14,8 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = NotificationFilter
+    pagination_class = KeysetPagination
+    ordering = ["-created_at", "-id"]
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)